@@ -1,10 +1,10 @@
-import openai
-import os, re
 import streamlit as st
-from dotenv import load_dotenv
-from gtts import gTTS
-from googletrans import Translator
-from datetime import datetime
+from enrole.llm import configure_openai, generate_script_with_gpt, translate_gpt, translate_lines_gpt
+from enrole.pipeline import download_audio, download_script
+from enrole.retranslate import retranslate_changes
+
+# 이 화면은 gpt-4o 로 대본을 만들고 번역함
+MODEL = "gpt-4o"
 
 # CSS 스타일 정의
 css = '''
@@ -33,115 +33,56 @@ css = '''
 # 스타일 적용 및 코드 출력
 st.markdown(css, unsafe_allow_html=True)
 
-# .env 파일 로드
-load_dotenv()
-
-# OpenAI API 키 설정 (환경 변수에서 가져오기)
-api_key = os.getenv('OPENAI_API_KEY')
-
-if not api_key:
-    raise ValueError("OpenAI API key not found. Please set the OPENAI_API_KEY environment variable.")
-
-openai.api_key = api_key
-
-# ChatGPT API 호출 함수
-def generate_script_with_gpt(grade, num_people, duration, key_phrases, key_words, situations=""):
-    response = openai.ChatCompletion.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system",
-             "content": "You are a skilled playwright specializing in role-playing scripts as a teacher. You excel at writing scripts with easy words, especially for elementary school students. You can write engaging role-play scripts using educationally appropriate words and situations that help students to use the key expressions in an interesting way."},
-            {"role": "user", "content": f'''Create a role-play script for {grade} grade Korean elementary school students. The script should play for {duration} seconds (a line in the script takes 4~5 seconds). Include {num_people} balanced roles in the script. Include Key phrases: {key_phrases} and Key words: {key_words}.
-             The format of the script is 'name:line'. Return scripts only.
-             {"" if situations=="" else "("+situations+") is The setting for the scenario you are creating. Reflect it in the background of the role-play scenario."}
-            #script example (make a script like this example's format. Same format, different content.)
-            [Characters]
-            1. Sumi: An active and curious student.
-            2. Jin: A calm and inquisitive student.
-            3. Minho: A student interested in history.
-            4. Hana: A responsible student who takes care of her friends.
-            
-            [Backgrounds]
-            When: Monday morning, right before the field trip.
-            Where: In the classroom and on the school bus.
-            Scene: Elementary school students are getting ready for a field trip to the museum.
-            They are discussing what they want to see and are excited about the trip.
-
-            [script]
-            Sumi: Hello, everyone! How are you today?    
-            Jin: I'm good, thank you. How about you, Sumi?        
-            Minho: I'm excited! We have a field trip today.        
-            Hana: Yes, we are going to the museum. What do you want to see first?        
-            Sumi: I want to see the dinosaur bones!        
-            Jin: Me too! Dinosaurs are so cool.
-            '''}
-        ]
-    )
-
-    # Convert the response to a Python dictionary
-    response_dict = response['choices'][0]['message']['content']
-    return response_dict
-
-def translate_gpt(script):
-    response = openai.ChatCompletion.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system",
-             "content": "You are a skilled playwright specializing in translating role-playing scripts for elementary school students. Your expertise is in using simple, educationally appropriate language that engages young learners. You excel at translating English scripts to Korean, maintaining the original context and simplicity."},
-            {"role": "user", "content": f'Please translate the following script to Korean, maintaining the same format and context. Ensure that the translation uses easy words suitable for elementary school students.\n{script}'}
-        ]
-    )
-
-    # Convert the response to a Python dictionary
-    response_dict = response['choices'][0]['message']['content']
-    return response_dict
-
-def remove_extras(script):
-    # 정규식 패턴 정의
-    start_marker_pattern = re.compile(r'\[scripts?\]', re.IGNORECASE)
-    
-    # 정규식으로 마커 찾기
-    match = start_marker_pattern.search(script)
-    
-    if not match:
-        raise ValueError("The marker '[script]' not found in the script")
-    
-    # 마커의 끝 위치 찾기
-    start_pos = match.end()
-    
-    # Extract the lines after the marker
-    script_lines = script[start_pos:].strip().split("\n")
-    
-    # Remove the lines with Korean translations and character names
-    english_lines = []
-    for line in script_lines:
-        if ":" in line:
-            parts = line.split(":")
-            if len(parts) > 1:
-                english_line = parts[1].strip()
-                if english_line:  # Ensure the line is not empty
-                    english_lines.append(english_line)
-    
-    # Join the English lines into the final script
-    final_script = "\n".join(english_lines).strip()
-    
-    if not final_script:
-        raise ValueError("Final script after removing Korean translation is empty")
-    
-    return final_script
-
-def download_audio(script):
-    script_without_korean = remove_extras(script)
-    tts = gTTS(script_without_korean, lang='en')
-    audio_file_path = "script_audio.mp3"
-    tts.save(audio_file_path)
-    return audio_file_path
-
-def download_script(script):
-    script_file_path = "script.txt"
-    with open(script_file_path, "w", encoding="utf-8") as file:
-        file.write(script)
-    return script_file_path
+# .env 파일을 읽고 OpenAI API 키 설정 (환경 변수에서 가져오기)
+configure_openai()
+
+# 고친 대본을 마지막으로 번역한 원문과 비교해 바뀐 줄만 번역하고 번역 칸의 제자리에 끼워 넣음
+# 버튼 콜백으로 실행해야 텍스트 칸(위젯) 값을 바꿀 수 있음
+def retranslate_edited_script():
+    edited = st.session_state['script_content']
+    st.session_state['retranslate_message'] = ""
+    try:
+        result = None
+        if st.session_state.get('translated_source') and st.session_state['translate_content']:
+            result = retranslate_changes(st.session_state['translated_source'], st.session_state['translate_content'],
+                                         edited, lambda lines, header: translate_lines_gpt(lines, header, model=MODEL),
+                                         lambda header: translate_gpt(header, model=MODEL))
+        if result is None:
+            # 줄을 맞출 수 없으면 전체를 다시 번역
+            translated = translate_gpt(edited, model=MODEL)
+            message = "전체 대본을 다시 번역했습니다."
+        else:
+            translated, changed = result
+            message = f"바뀐 대사 {changed}줄만 다시 번역했습니다."
+    except ValueError as e:
+        st.session_state['retranslate_message'] = str(e)
+        return
+
+    st.session_state['script'] = edited
+    st.session_state['translated'] = translated
+    st.session_state['translated_source'] = edited
+    st.session_state['translate_content'] = translated
+    st.session_state['retranslate_message'] = message
+
+# 대본을 만들고 번역해서 텍스트 칸에 넣음
+# 텍스트 칸(위젯)이 만들어진 뒤에는 값을 바꿀 수 없으므로 버튼 콜백으로 실행함
+def generate_script():
+    st.session_state['generate_error'] = ""
+    try:
+        with st.spinner("대본을 만들고 번역하는 중..."):
+            script = generate_script_with_gpt(st.session_state['grade'], st.session_state['num_people'], st.session_state['duration'],
+                                              st.session_state['expressions'], st.session_state['words'], st.session_state['situations'], model=MODEL)
+            translated = translate_gpt(script, model=MODEL)
+    except ValueError as e:
+        st.session_state['generate_error'] = str(e)
+        return
+
+    st.session_state['script'] = script
+    st.session_state['translated'] = translated
+    st.session_state['translated_source'] = script
+    st.session_state['script_content'] = script
+    st.session_state['translate_content'] = translated
+    st.session_state['retranslate_message'] = ""
 
 # Streamlit UI 구성
 st.title("영어 대본 생성기")
@@ -149,9 +90,9 @@ st.subheader("EnRole: English Role-play Scripter")
 st.write("교사 박현수, 버그 및 개선 문의: hanzch84@gmail.com")
 cola, colb, colc = st.columns([2,3,4])
 
-grade = cola.selectbox("학년", ["3rd", "4th", "5th", "6th"], index=3)
-num_people = colb.slider("상황극 인원", min_value=2, max_value=10, value=3)
-duration = colc.slider("상황극 길이(초)", min_value=10, max_value=300, value=30)
+grade = cola.selectbox("학년", ["3rd", "4th", "5th", "6th"], index=3, key="grade")
+num_people = colb.slider("상황극 인원", min_value=2, max_value=10, value=3, key="num_people")
+duration = colc.slider("상황극 길이(초)", min_value=10, max_value=300, value=30, key="duration")
 with st.expander("상세 옵션"):
     situations = st.text_input("간단한 상황 입력(한글 혹은 영어)", key="situations", placeholder="대략적인 상황극의 상황을 한글이나 영어로 입력해 주세요.(예)우주선의 고장으로 조난을 당함.")
     key_words = st.text_input("주요 단어 입력", key="words", placeholder="cold, headache, medicine 등 연습할 단어를 쉼표로 구분해서 입력하세요.")
@@ -172,37 +113,14 @@ translate_height = max(200, len(st.session_state['translate_content'].split('\n'
 st.text_area("Generated Script", value=st.session_state['script_content'], height=script_height, key='script_content')
 st.text_area("Translated Script", value=st.session_state['translate_content'], height=translate_height, key='translate_content')
 
-if col1.button("상황극 대본 생성"):
-    try:
-        overlay_container = st.empty()
-        overlay_container.markdown("""
-        <style>
-        .overlay {
-            position: fixed;top: 0;left: 0;width: 100%;height: 100%;
-            background: rgba(0, 0, 0, 0.7);z-index: 999;display: flex;
-            justify-content: center;align-items: center;                }
-        .spinner {margin-bottom: 10px;}
-        </style>
-        <div class="overlay"><div><div class="spinner">
-                    <span class="fa fa-spinner fa-spin fa-3x"></span>
-                </div><div style="color: white;">대본을 만들고 번역하는 중...</div></div></div>""", unsafe_allow_html=True)
-        
-        st.session_state['script'] = generate_script_with_gpt(grade, num_people, duration, key_phrases, key_words, situations)
-        st.session_state['translated'] = translate_gpt(st.session_state['script'])
-        
-        st.session_state['script_content'] = st.session_state['script']
-        st.session_state['translate_content'] = st.session_state['translated']
-        
-        # 텍스트 에어리어 업데이트
-        script_height = max(200, len(st.session_state['script_content'].split('\n')) * 25)
-        translate_height = max(200, len(st.session_state['translate_content'].split('\n')) * 25)
-        
-        st.text_area("Generated Script", value=st.session_state['script_content'], height=script_height, key='script_content')
-        st.text_area("Translated Script", value=st.session_state['translate_content'], height=translate_height, key='translate_content')
-        
-        overlay_container.empty()
-    except ValueError as e:
-        st.error(str(e))
+if st.session_state['script']:
+    st.button("변경 부분 번역", on_click=retranslate_edited_script)
+    if st.session_state.get('retranslate_message'):
+        st.caption(st.session_state['retranslate_message'])
+
+col1.button("상황극 대본 생성", on_click=generate_script)
+if st.session_state.get('generate_error'):
+    st.error(st.session_state['generate_error'])
 
 if st.session_state['script']:
     if col2.button("음성 생성"):
@@ -220,9 +138,8 @@ if st.session_state['script']:
                 <span class="fa fa-spinner fa-spin fa-3x"></span>
             </div><div style="color: white;">대본을 오디오 파일로 생성 중...</div></div></div>""", unsafe_allow_html=True)
             
-            audio_file = download_audio(st.session_state['script'])
-            with open(audio_file, "rb") as file:
-                col22.download_button(label="음성 다운로드", data=file, file_name="script_audio.mp3", mime="audio/mp3")
+            audio = download_audio(st.session_state['script'])
+            col22.download_button(label="음성 다운로드", data=audio, file_name="script_audio.mp3", mime="audio/mp3")
                 
             overlay_container.empty()
         except ValueError as e:
@@ -230,5 +147,4 @@ if st.session_state['script']:
 
     if col3.button("대본 생성"):
         script_file = download_script(st.session_state['script']+'\n\n\n'+st.session_state['translated'])
-        with open(script_file, "rb") as file:
-            col33.download_button(label="대본 다운로드", data=file, file_name="script.txt", mime="text/plain")
+        col33.download_button(label="대본 다운로드", data=script_file, file_name="script.txt", mime="text/plain")
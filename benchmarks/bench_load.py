@@ -0,0 +1,285 @@
+# 여러 세션이 동시에 대본 생성 → 번역 → 음성 → 다운로드를 하는 상황을 흉내 내는 부하 측정
+# OpenAI 는 가짜 서버(fake_openai.py), gTTS/googletrans 는 가짜(stubs.py)를 써서 비용 없이 돌아감
+# 실행: python benchmarks/bench_load.py [--sessions 40] [--concurrency 8] [--latency 0.3] [--error-rate 0.02]
+# 결과는 benchmarks/results/ 에 JSON 으로 남고, 같은 조건의 지난 결과와 비교해서 나빠진 항목을 표시함
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+STEPS = ('first_chunk', 'generate', 'translate', 'audio', 'download', 'total')
+# 비교할 항목과, 값이 클수록 좋은지 여부
+COMPARED = [('throughput', True), ('errors', False), ('memory_per_session_kb', False)] + \
+           [(f'{step}.{name}', False) for step in STEPS for name in ('p95', 'p99')]
+# 기록에 남기되 지난 결과와 같은 조건인지 볼 때는 빼는 설정
+UNCOMPARED_PARAMS = ('label', 'save', 'baseline', 'check', 'tolerance')
+# 시간 항목은 이보다 작은 차이(초)는 비율이 커도 회귀로 보지 않음 (1ms 가 2ms 가 되는 것 같은 잡음)
+MIN_SECONDS_CHANGE = 0.01
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or 'unknown'
+    except OSError:
+        return 'unknown'
+
+
+def summarize(values):
+    from enrole.router import percentile
+    if not values:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'mean': 0.0, 'max': 0.0}
+    return {'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95), 'p99': percentile(values, 0.99),
+            'mean': sum(values) / len(values), 'max': max(values)}
+
+
+# 세션 하나. 세션마다 다른 핵심 단어를 써서 캐시에 걸리지 않게 함 (--distinct 로 겹치게 할 수 있음)
+def run_session(index, args):
+    from enrole.artifacts import SessionArtifacts
+    from enrole.bundle import bundle_bytes, iter_script_bundle
+    from enrole.llm import generate_script_with_gpt_stream
+    from enrole.pipeline import download_audio, download_script, iter_script_with_translation
+    from enrole.translate import translate_script
+
+    variant = index % args.distinct if args.distinct else index
+    spec = {'grade': '5th', 'num_people': 3, 'duration': args.duration, 'key_phrases': 'How about ...?',
+            'key_words': f'office, report, bench{variant}', 'situation': ''}
+    artifacts = SessionArtifacts()
+    timings = {}
+    started = time.perf_counter()
+    script = translated = None
+    script_done = None
+
+    if args.translator == 'gpt':
+        # 화면과 같은 경로: 대본을 스트리밍으로 받으며 대사 묶음마다 GPT 번역을 동시에 돌림
+        for kind, payload in iter_script_with_translation(spec['grade'], spec['num_people'], spec['duration'],
+                                                          spec['key_phrases'], spec['key_words'], spec['situation']):
+            now = time.perf_counter()
+            if kind == 'script':
+                timings.setdefault('first_chunk', now - started)
+                script_done = now
+            elif kind == 'done':
+                script, translated = payload
+        timings['generate'] = script_done - started
+        timings['translate'] = time.perf_counter() - script_done
+    else:
+        script = ''
+        for chunk in generate_script_with_gpt_stream(spec['grade'], spec['num_people'], spec['duration'],
+                                                     spec['key_phrases'], spec['key_words'], spec['situation']):
+            timings.setdefault('first_chunk', time.perf_counter() - started)
+            script += chunk
+        script_done = time.perf_counter()
+        timings['generate'] = script_done - started
+        translated = translate_script(script)
+        timings['translate'] = time.perf_counter() - script_done
+
+    step = time.perf_counter()
+    artifacts.get_or_create('audio', script, lambda: download_audio(script))
+    timings['audio'] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    artifacts.get_or_create('script', script, lambda: download_script(script))
+    artifacts.get_or_create('bundle', script, lambda: bundle_bytes(iter_script_bundle(script, translated, audio=False)))
+    timings['download'] = time.perf_counter() - step
+    timings['total'] = time.perf_counter() - started
+    # 세션이 들고 있는 것: 산출물 + 대본/번역 문자열
+    retained = artifacts.size() + len(script.encode('utf-8')) + len(translated.encode('utf-8'))
+    return timings, retained
+
+
+# 혼자 도는 세션 하나의 메모리 최고치(tracemalloc). 부하 중에는 스레드별로 나눌 수 없어서 따로 잼
+def probe_memory(args):
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        _, retained = run_session(-1, args)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return peak, retained
+
+
+def run_load(args):
+    results, errors = [], []
+    lock = threading.Lock()
+    delay = args.ramp / args.sessions if args.ramp else 0.0
+
+    def session(index):
+        if delay:
+            time.sleep(index % args.concurrency * delay)
+        try:
+            result = run_session(index, args)
+        except Exception as e:
+            with lock:
+                errors.append(f'{type(e).__name__}: {e}')
+            return
+        with lock:
+            results.append(result)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix='session') as executor:
+        list(executor.map(session, range(args.sessions)))
+    return results, errors, time.perf_counter() - started
+
+
+def run_benchmark(args):
+    # enrole 은 import 할 때 환경 변수를 읽으므로, 캐시 폴더와 한도를 먼저 정한 뒤에 불러옴
+    os.environ['ENROLE_CACHE_DIR'] = tempfile.mkdtemp(prefix='enrole-bench-')
+    os.environ.setdefault('OPENAI_API_KEY', 'fake')
+    os.environ.setdefault('ENROLE_METRICS_LOG', '')
+    if args.rpm:
+        os.environ['ENROLE_LLM_RPM'] = args.rpm
+    import openai
+
+    import stubs
+    from enrole.llm import configure_openai
+    from enrole.llm_client import get_llm_client
+    from enrole.metrics import stage_metrics
+    from fake_openai import FakeSettings, api_base, start_fake_openai
+
+    # 메모리를 잴 세션은 오류 없이 돌리고, 부하를 줄 때부터 오류를 섞음
+    settings = FakeSettings(args.latency, args.jitter, args.tokens_per_second, 0.0, args.error_status)
+    server, _ = start_fake_openai(settings)
+    configure_openai()
+    openai.api_base = api_base(server)
+    stubs.install(args.tts_latency, args.translate_latency)
+
+    peak, retained = probe_memory(args)
+    settings.error_rate = args.error_rate
+    results, errors, wall = run_load(args)
+    server.shutdown()
+
+    report = {
+        'label': args.label or time.strftime('%Y%m%d-%H%M%S'),
+        'revision': git_revision(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {key: value for key, value in vars(args).items() if key not in UNCOMPARED_PARAMS},
+        'sessions': len(results),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'seconds': wall,
+        'throughput': len(results) / wall if wall else 0.0,
+        'memory_per_session_kb': peak / 1024,
+        'retained_per_session_kb': retained / 1024,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'steps': {step: summarize([timings[step] for timings, _ in results if step in timings]) for step in STEPS},
+        'fake_openai': settings.snapshot(),
+        'stubs': dict(stubs.calls),
+        'llm_client': get_llm_client().snapshot(),
+        'stages': {stage: {'calls': stats['calls'], 'errors': stats['errors'], 'seconds': stats['seconds']}
+                   for stage, stats in stage_metrics().snapshot().items()},
+    }
+    return report
+
+
+def metric(report, name):
+    if '.' in name:
+        step, key = name.split('.')
+        return report['steps'].get(step, {}).get(key)
+    return report.get(name)
+
+
+# 같은 조건으로 돌린 가장 최근 결과
+def find_baseline(report):
+    candidates = []
+    for path in glob.glob(os.path.join(RESULTS_DIR, '*.json')):
+        try:
+            with open(path, encoding='utf-8') as file:
+                previous = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if previous.get('params') == report['params'] and previous.get('label') != report['label']:
+            candidates.append((previous.get('created', ''), path, previous))
+    return max(candidates, key=lambda item: item[0])[1:] if candidates else (None, None)
+
+
+# (항목, 지난 값, 이번 값, 변화율, 나빠졌는지) 목록
+def compare(baseline, report, tolerance):
+    rows = []
+    for name, higher_is_better in COMPARED:
+        before, after = metric(baseline, name), metric(report, name)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else (0.0 if after == before else float('inf'))
+        worse = -change if higher_is_better else change
+        noise = '.' in name and abs(after - before) < MIN_SECONDS_CHANGE
+        rows.append((name, before, after, change, worse > tolerance and not noise))
+    return rows
+
+
+def print_report(report):
+    print(f"{report['label']} ({report['revision']}): {report['sessions']} sessions in {report['seconds']:.1f}s, "
+          f"{report['throughput']:.2f} sessions/s, {report['errors']} failed")
+    print(f"{'step':12s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'mean':>8s}")
+    for step, stats in report['steps'].items():
+        print(f"{step:12s} {stats['p50']:8.3f} {stats['p95']:8.3f} {stats['p99']:8.3f} {stats['mean']:8.3f}")
+    print(f"memory per session: peak {report['memory_per_session_kb']:.0f} KB (tracemalloc, alone), "
+          f"retained {report['retained_per_session_kb']:.0f} KB; process max RSS {report['max_rss_mb']:.0f} MB")
+    print(f"fake OpenAI {report['fake_openai']}, stubs {report['stubs']}, client {report['llm_client']}")
+    for sample in report['error_samples']:
+        print(f'  error: {sample}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=8, help='동시에 진행하는 세션 수')
+    parser.add_argument('--ramp', type=float, default=0.0, help='처음 세션들의 시작을 이 시간(초)에 걸쳐 나눔')
+    parser.add_argument('--distinct', type=int, default=0, help='서로 다른 요청 수 (0 이면 세션마다 다름)')
+    parser.add_argument('--duration', type=int, default=30, help='대본 목표 길이(초)')
+    parser.add_argument('--translator', choices=('gpt', 'googletrans'), default='gpt')
+    parser.add_argument('--latency', type=float, default=0.3, help='가짜 OpenAI 의 첫 조각까지 지연(초)')
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--tokens-per-second', type=float, default=200.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=429)
+    parser.add_argument('--tts-latency', type=float, default=0.15)
+    parser.add_argument('--translate-latency', type=float, default=0.1)
+    parser.add_argument('--rpm', default='', help='ENROLE_LLM_RPM 과 같은 형식 (기본은 앱 설정)')
+    parser.add_argument('--label', default='', help='결과 이름 (기본은 시각)')
+    parser.add_argument('--no-save', dest='save', action='store_false')
+    parser.add_argument('--baseline', default='', help='비교할 결과 파일 (기본은 같은 조건의 최근 결과)')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='이 비율보다 나빠지면 회귀로 표시')
+    parser.add_argument('--check', action='store_true', help='회귀가 있으면 종료 코드 1')
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    report = run_benchmark(args)
+    print_report(report)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline_path, baseline = args.baseline, json.load(file)
+    else:
+        baseline_path, baseline = find_baseline(report)
+    regressions = []
+    if baseline is not None:
+        print(f"\ncompared with {os.path.relpath(baseline_path, ROOT)} ({baseline.get('revision')})")
+        for name, before, after, change, regressed in compare(baseline, report, args.tolerance):
+            print(f"{name:24s} {before:10.3f} -> {after:10.3f} {change:+8.1%}{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(name)
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{report['label']}.json")
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f'saved {os.path.relpath(path, ROOT)}')
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
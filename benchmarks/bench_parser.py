@@ -0,0 +1,119 @@
+# ScriptDocument 파서와 예전 remove_extras / translate_script 파싱 방식을 큰 대본으로 비교하는 마이크로 벤치마크
+# 실행: python benchmarks/bench_parser.py [--lines 20000] [--repeat 5]
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enrole.parser import ScriptParser, parse_script, remove_extras  # noqa: E402
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'script.txt')
+
+
+# 예전 streamlit_app.py 의 remove_extras (마커 변형마다 str.find)
+def legacy_remove_extras_find(script):
+    start_marker = "[script]"
+    start_pos = script.find(start_marker)
+    if start_pos == -1:
+        start_pos = script.find("[Script]")
+    if start_pos == -1:
+        start_pos = script.find("[Scripts]")
+    if start_pos == -1:
+        start_pos = script.find("[scripts]")
+    if start_pos == -1:
+        raise ValueError("The marker '[script]' not found in the script")
+    start_pos += len(start_marker)
+    script_lines = script[start_pos:].strip().split("\n")
+    english_lines = []
+    for line in script_lines:
+        if ":" in line:
+            parts = line.split(":")
+            if len(parts) > 1:
+                english_line = parts[1].strip()
+                if english_line:
+                    english_lines.append(english_line)
+    return "\n".join(english_lines).strip()
+
+
+# 예전 app.py 의 remove_extras (정규식으로 마커 검색)
+def legacy_remove_extras_regex(script):
+    match = re.compile(r'\[scripts?\]', re.IGNORECASE).search(script)
+    if not match:
+        raise ValueError("The marker '[script]' not found in the script")
+    script_lines = script[match.end():].strip().split("\n")
+    english_lines = []
+    for line in script_lines:
+        if ":" in line:
+            parts = line.split(":")
+            if len(parts) > 1:
+                english_line = parts[1].strip()
+                if english_line:
+                    english_lines.append(english_line)
+    return "\n".join(english_lines).strip()
+
+
+# 예전 translate_script 가 번역 전에 하던 줄 나누기 (번역 호출은 빼고 파싱 비용만)
+def legacy_translate_split(script):
+    pairs = []
+    for line in script.split('\n'):
+        if ':' in line:
+            name, sentence = line.split(':', 1)
+            pairs.append((name, sentence.strip()))
+    return pairs
+
+
+# 예전 방식으로 한 번의 클릭에서 하던 일: 음성용 추출 + 번역용 분리를 각각 따로 훑음
+def legacy_both(script):
+    legacy_remove_extras_find(script)
+    legacy_translate_split(script)
+
+
+def parser_stream(script, chunk_size=8):
+    parser = ScriptParser()
+    for i in range(0, len(script), chunk_size):
+        parser.feed(script[i:i + chunk_size])
+    parser.close()
+    return parser.document
+
+
+def build_script(num_lines):
+    sample = open(SAMPLE_PATH, encoding='utf-8').read().split('\n\n\n\n')[0]
+    header, _, body = sample.partition('[script]')
+    body_lines = [line for line in body.strip().split('\n') if line.strip()]
+    # 대사 안에 콜론이 든 줄도 섞어서 예전 방식이 잘리는 경우를 포함
+    body_lines.append('Jisoo: The meeting starts at 3:30, right?')
+    lines = [body_lines[i % len(body_lines)] for i in range(num_lines)]
+    return header + '[script]\n' + '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    script = build_script(args.lines)
+    cases = [
+        ('legacy remove_extras (find)', lambda: legacy_remove_extras_find(script)),
+        ('legacy remove_extras (regex)', lambda: legacy_remove_extras_regex(script)),
+        ('legacy remove_extras + translate split', lambda: legacy_both(script)),
+        ('parse_script', lambda: parse_script(script)),
+        ('parse_script + remove_extras', lambda: remove_extras(parse_script(script))),
+        ('ScriptParser.feed (8-char chunks)', lambda: parser_stream(script)),
+    ]
+
+    print(f'{args.lines} lines, {len(script)} chars, best of {args.repeat}')
+    for name, case in cases:
+        best = min(timeit.repeat(case, number=1, repeat=args.repeat))
+        print(f'{name:42s} {best * 1000:9.2f} ms')
+
+    truncated = sum(1 for a, b in zip(legacy_remove_extras_find(script).split('\n'),
+                                      remove_extras(script).split('\n')) if a != b)
+    print(f'lines truncated by the legacy colon split: {truncated}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# 음성 엔진별로 대사 한 줄 합성 시간을 재서 배포에 쓸 엔진(ENROLE_TTS_BACKEND)을 고를 때 참고함
+# 캐시를 거치지 않고 엔진을 바로 부름. gtts 는 실제 Google 서버에 요청하므로 인터넷이 필요함
+# 실행: python benchmarks/bench_tts.py [--backends gtts,espeak] [--lines 14] [--concurrency 4]
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from enrole.duration import mp3_seconds  # noqa: E402
+from enrole.parser import parse_script  # noqa: E402
+from enrole.router import percentile  # noqa: E402
+from enrole.tts import TTS_BACKENDS, strip_id3  # noqa: E402
+
+SAMPLE_PATH = os.path.join(ROOT, 'script.txt')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+def sample_lines(count):
+    document = parse_script(open(SAMPLE_PATH, encoding='utf-8').read().split('\n\n\n\n')[0])
+    texts = document.texts()
+    # 같은 문장을 되풀이해도 엔진 쪽 캐시가 없도록 번호를 붙임
+    return [f'{texts[i % len(texts)]} Number {i + 1}.' for i in range(count)]
+
+
+def timed_synthesis(backend, text):
+    started = time.perf_counter()
+    audio = strip_id3(backend.synthesize(text, 'en'))
+    return time.perf_counter() - started, audio
+
+
+def bench_backend(backend, lines, concurrency):
+    # 처음 한 번은 연결/프로세스 준비 시간이 섞이므로 따로 잼
+    first, _ = timed_synthesis(backend, lines[0])
+    sequential = [timed_synthesis(backend, text) for text in lines]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        concurrent = list(executor.map(lambda text: timed_synthesis(backend, text), lines))
+    wall = time.perf_counter() - started
+    seconds = [elapsed for elapsed, _ in sequential]
+    audio_seconds = sum(mp3_seconds(audio) for _, audio in sequential)
+    return {
+        'first': first,
+        'p50': percentile(seconds, 0.5),
+        'p95': percentile(seconds, 0.95),
+        'mean': sum(seconds) / len(seconds),
+        'concurrent_wall': wall,
+        'concurrent_p95': percentile([elapsed for elapsed, _ in concurrent], 0.95),
+        # 1 보다 크면 재생 시간보다 빨리 만듦
+        'realtime_factor': audio_seconds / sum(seconds) if sum(seconds) else 0.0,
+        'bytes_per_line': sum(len(audio) for _, audio in sequential) / len(sequential),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backends', default=','.join(TTS_BACKENDS), help='쉼표로 구분한 엔진 이름')
+    parser.add_argument('--lines', type=int, default=14)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--save', action='store_true', help='benchmarks/results/tts-<시각>.json 으로 저장')
+    args = parser.parse_args()
+
+    lines = sample_lines(args.lines)
+    results = {}
+    print(f'{args.lines} lines, concurrency {args.concurrency}')
+    print(f"{'backend':8s} {'first':>7s} {'p50':>7s} {'p95':>7s} {'mean':>7s} {'par-wall':>9s} {'par-p95':>8s} {'x-real':>7s} {'KB/line':>8s}")
+    for name in args.backends.split(','):
+        backend_class = TTS_BACKENDS.get(name.strip())
+        if backend_class is None or not backend_class.available():
+            print(f'{name:8s} not available')
+            continue
+        try:
+            stats = results[name] = bench_backend(backend_class(), lines, args.concurrency)
+        except Exception as e:
+            print(f'{name:8s} failed: {e}')
+            continue
+        print(f"{name:8s} {stats['first']:7.3f} {stats['p50']:7.3f} {stats['p95']:7.3f} {stats['mean']:7.3f} "
+              f"{stats['concurrent_wall']:9.3f} {stats['concurrent_p95']:8.3f} {stats['realtime_factor']:7.1f} "
+              f"{stats['bytes_per_line'] / 1024:8.1f}")
+
+    if args.save and results:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"tts-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'lines': args.lines, 'concurrency': args.concurrency, 'backends': results}, file, indent=2)
+        print(f'saved {os.path.relpath(path, ROOT)}')
+
+
+if __name__ == '__main__':
+    main()
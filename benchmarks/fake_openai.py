@@ -0,0 +1,226 @@
+# 부하 측정용 가짜 OpenAI chat-completions 서버 (유료 API 를 부르지 않음)
+# script.txt 의 대본/번역을 돌려주며, 스트리밍(SSE), 응답 지연, 오류 주입을 흉내 냄
+# 따로 실행해서 실제 앱을 붙일 수도 있음:
+#   python benchmarks/fake_openai.py --port 8901 --latency 0.5
+#   OPENAI_API_BASE=http://127.0.0.1:8901/v1 OPENAI_API_KEY=fake streamlit run streamlit_app.py
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enrole.parser import parse_script  # noqa: E402
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'script.txt')
+# 스트리밍 조각 하나에 담을 글자 수 (대략 토큰 하나)
+CHUNK_CHARS = 4
+
+
+# script.txt 를 영어 대본과 한국어 번역으로 나눠 읽음
+def load_sample(path=SAMPLE_PATH):
+    blocks = [block.strip() for block in open(path, encoding='utf-8').read().split('\n\n\n\n') if block.strip()]
+    return blocks[0], blocks[1] if len(blocks) > 1 else blocks[0]
+
+
+# 응답 지연과 오류를 정하는 설정. 서버가 떠 있는 동안 바꿔도 다음 요청부터 반영됨
+class FakeSettings:
+    def __init__(self, latency=0.3, jitter=0.1, tokens_per_second=80.0, error_rate=0.0, error_status=429,
+                 retry_after=0.2, script_path=SAMPLE_PATH):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.script, self.translation = load_sample(script_path)
+        self.english = parse_script(self.script)
+        self.korean = parse_script(self.translation)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'streams': 0, 'errors': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+    def count(self, **values):
+        with self.lock:
+            for name, value in values.items():
+                self.stats[name] += value
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def first_token_delay(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    # 한국어 번역 대사를 돌아가며 씀
+    def korean_line(self, index):
+        lines = self.korean.lines or self.english.lines
+        return lines[index % len(lines)].text
+
+    # 요청 내용(프롬프트)을 보고 enrole 이 기대하는 형식의 답을 만듦
+    def reply(self, request):
+        user = request['messages'][-1]['content']
+        if request.get('response_format'):
+            return json.dumps(self.bilingual_payload(hashlib.sha1(user.encode('utf-8')).hexdigest()[:4]), ensure_ascii=False)
+        if 'situation in Korean' in user:
+            return f'우주선 고장으로 조난 당한 {random.randint(1, 999)}번 우주선의 긴박한 상황.'
+        if 'script lines to Korean' in user:
+            lines = [line for line in user.split('\n')[1:] if ':' in line]
+            return '\n'.join(f'{line.split(":", 1)[0].strip()}: {self.korean_line(index)}' for index, line in enumerate(lines))
+        if 'translate the following script' in user:
+            return self.translation
+        if 'too short' in user:
+            speakers = self.english.speakers() or ['Sumi']
+            return '\n'.join(f'{speakers[index % len(speakers)]}: {line.text}'
+                             for index, line in enumerate(self.english.lines[:2]))
+        return self.vary(self.script, user)
+
+    # 같은 프롬프트에는 같은 대본을, 다른 프롬프트에는 대사가 조금씩 다른 대본을 돌려줌
+    # (모든 세션이 똑같은 대사를 받으면 음성/번역 캐시가 실제보다 훨씬 많이 맞아떨어짐)
+    def vary(self, script, prompt):
+        tag = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:4]
+        head, marker, body = script.partition('[script]')
+        if not marker:
+            return script
+        lines = [f'{line.rstrip()} ({tag}-{index})' if ':' in line else line
+                 for index, line in enumerate(body.split('\n'))]
+        return head + marker + '\n'.join(lines)
+
+    def bilingual_payload(self, tag):
+        return {
+            'characters': [{'name': name, 'en': en, 'ko': ko}
+                           for (name, en), (_, ko) in zip(self.english.characters, self.korean.characters)],
+            'background': {field.lower(): {'en': en, 'ko': ko}
+                           for (field, en), (_, ko) in zip(self.english.background, self.korean.background)},
+            'lines': [{'speaker': line.speaker, 'en': f'{line.text} ({tag}-{index})', 'ko': self.korean_line(index)}
+                      for index, line in enumerate(self.english.lines)],
+        }
+
+
+def count_tokens(text):
+    return max(1, len(text) // CHUNK_CHARS)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    settings = None
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path.rstrip('/').split('/')[-1] != 'completions':
+            self.send_json(404, {'error': {'message': 'not found', 'type': 'invalid_request_error'}})
+            return
+        request = json.loads(body)
+        settings = self.settings
+        settings.count(requests=1)
+        if random.random() < settings.error_rate:
+            settings.count(errors=1)
+            self.send_json(settings.error_status, {'error': {'message': 'injected error', 'type': 'server_error'}},
+                           {'Retry-After': str(settings.retry_after)})
+            return
+
+        content = settings.reply(request)
+        prompt_tokens = count_tokens(''.join(message['content'] for message in request['messages']))
+        completion_tokens = count_tokens(content) * request.get('n', 1)
+        settings.count(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                 'total_tokens': prompt_tokens + completion_tokens}
+        time.sleep(settings.first_token_delay())
+        if request.get('stream'):
+            settings.count(streams=1)
+            self.send_stream(request, content, usage)
+            return
+        # 스트리밍이 아니면 전체 생성 시간을 기다렸다가 한 번에 보냄
+        time.sleep(count_tokens(content) / settings.tokens_per_second)
+        self.send_json(200, {
+            'id': 'chatcmpl-fake', 'object': 'chat.completion', 'created': int(time.time()), 'model': request['model'],
+            'choices': [{'index': index, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}
+                        for index in range(request.get('n', 1))],
+            'usage': usage,
+        })
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_event(self, data):
+        payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+        self.wfile.write(f'data: {payload}\n\n'.encode('utf-8'))
+        self.wfile.flush()
+
+    def send_stream(self, request, content, usage):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        delay = 1 / self.settings.tokens_per_second
+        base = {'id': 'chatcmpl-fake', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': request['model']}
+        try:
+            for start in range(0, len(content), CHUNK_CHARS):
+                self.send_event(dict(base, choices=[{'index': 0, 'delta': {'content': content[start:start + CHUNK_CHARS]},
+                                                     'finish_reason': None}]))
+                time.sleep(delay)
+            self.send_event(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))
+            if (request.get('stream_options') or {}).get('include_usage'):
+                self.send_event(dict(base, choices=[], usage=usage))
+            self.send_event('[DONE]')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+# 백그라운드 스레드에서 서버를 띄우고 (서버, 설정) 을 돌려줌. port=0 이면 빈 포트를 씀
+def start_fake_openai(settings=None, host='127.0.0.1', port=0):
+    settings = settings or FakeSettings()
+    handler = type('Handler', (FakeOpenAIHandler,), {'settings': settings})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-openai', daemon=True).start()
+    return server, settings
+
+
+def api_base(server):
+    host, port = server.server_address[:2]
+    return f'http://{host}:{port}/v1'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8901)
+    parser.add_argument('--latency', type=float, default=0.3, help='첫 조각까지의 지연(초)')
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='오류로 답할 요청 비율 (0~1)')
+    parser.add_argument('--error-status', type=int, default=429)
+    parser.add_argument('--script', default=SAMPLE_PATH, help='돌려줄 대본 파일 (script.txt 형식)')
+    args = parser.parse_args()
+
+    settings = FakeSettings(args.latency, args.jitter, args.tokens_per_second, args.error_rate, args.error_status,
+                            script_path=args.script)
+    server, _ = start_fake_openai(settings, args.host, args.port)
+    print(f'fake OpenAI listening on {api_base(server)}')
+    try:
+        while True:
+            time.sleep(60)
+            print(settings.snapshot())
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
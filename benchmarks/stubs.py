@@ -0,0 +1,64 @@
+# 부하 측정용 가짜 gTTS / googletrans. 네트워크 없이 정해 둔 지연만큼 기다렸다가 답함
+import random
+import threading
+import time
+
+import enrole.translate
+import enrole.tts
+from enrole.translate import TranslatorPool
+
+# MPEG-1 Layer III, 32kbps, 44.1kHz 프레임 하나 (104 bytes, 약 26ms). enrole.duration.mp3_seconds 로 길이를 읽을 수 있음
+MP3_FRAME = b'\xff\xfb\x10\x00' + b'\x00' * 100
+FRAME_SECONDS = 1152 / 44100
+WORDS_PER_SECOND = 2.5
+
+# 설치된 가짜들이 받은 요청 수 (스레드 여러 개가 같이 씀)
+calls = {'tts': 0, 'translate': 0}
+calls_lock = threading.Lock()
+
+
+def count(name):
+    with calls_lock:
+        calls[name] += 1
+
+
+# gTTS 와 같은 모양. 단어 수에 맞는 길이의 MP3 프레임을 씀
+class StubTTS:
+    latency = 0.15
+    jitter = 0.05
+
+    def __init__(self, text, lang='en'):
+        self.text = text
+        self.lang = lang
+
+    def write_to_fp(self, fp):
+        count('tts')
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        frames = max(1, round(len(self.text.split()) / WORDS_PER_SECOND / FRAME_SECONDS))
+        fp.write(MP3_FRAME * frames)
+
+
+class StubTranslation:
+    def __init__(self, text):
+        self.text = text
+
+
+# googletrans.Translator 와 같은 모양. 줄 수를 그대로 지킨 '번역' 을 돌려줌
+class StubTranslator:
+    latency = 0.1
+
+    def translate(self, text, src='en', dest='ko'):
+        count('translate')
+        time.sleep(self.latency)
+        return StubTranslation('\n'.join(f'[{dest}] {line}' if line.strip() else line for line in text.split('\n')))
+
+
+def install(tts_latency=None, translate_latency=None):
+    if tts_latency is not None:
+        StubTTS.latency = tts_latency
+        StubTTS.jitter = min(StubTTS.jitter, tts_latency)
+    if translate_latency is not None:
+        StubTranslator.latency = translate_latency
+    enrole.tts.gTTS = StubTTS
+    enrole.translate.Translator = StubTranslator
+    enrole.translate._pool = TranslatorPool(factory=StubTranslator)
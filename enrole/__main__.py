@@ -0,0 +1,5 @@
+import sys
+
+from enrole.cli import main
+
+sys.exit(main())
@@ -0,0 +1,48 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+# 세션 하나가 메모리에 들고 있을 수 있는 산출물 최대 크기 (기본 20MB)
+MAX_SESSION_BYTES = int(os.getenv('ENROLE_SESSION_ARTIFACT_BYTES', str(20 * 1024 * 1024)))
+
+
+def digest(source):
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+# 세션별 산출물(음성, 대본 파일) 저장소. 파일을 쓰지 않고 bytes 로만 들고 있음
+# st.session_state 에 넣어 두면 세션이 끝날 때 함께 정리됨
+class SessionArtifacts:
+    def __init__(self, max_bytes=MAX_SESSION_BYTES):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()   # name -> (원본 대본의 해시, bytes)
+
+    # 원본 대본이 그대로일 때만 저장된 산출물을 돌려줌
+    def get(self, name, source):
+        item = self.items.get(name)
+        if item is None or item[0] != digest(source):
+            return None
+        self.items.move_to_end(name)
+        return item[1]
+
+    def put(self, name, source, data):
+        if len(data) > self.max_bytes:
+            raise ValueError(f"The {name} file is too large to keep in this session ({len(data)} bytes).")
+        self.items.pop(name, None)
+        # 한도를 넘으면 가장 오래 쓰지 않은 산출물부터 비움
+        while self.items and self.size() + len(data) > self.max_bytes:
+            self.items.popitem(last=False)
+        self.items[name] = (digest(source), data)
+        return data
+
+    def get_or_create(self, name, source, factory):
+        data = self.get(name, source)
+        if data is None:
+            data = self.put(name, source, factory())
+        return data
+
+    def size(self):
+        return sum(len(data) for _, data in self.items.values())
+
+    def clear(self):
+        self.items.clear()
@@ -0,0 +1,30 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 한꺼번에 생성할 때 동시에 돌릴 모둠 수 기본값
+BATCH_WORKERS = int(os.getenv('ENROLE_BATCH_WORKERS', '3'))
+
+
+# 모둠 설정 목록을 스레드 풀에서 동시에 처리하고, 끝나는 순서대로 (번호, 설정, 결과, 오류) 를 돌려줌
+def run_batch(specs, worker, max_workers=BATCH_WORKERS):
+    if not specs:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(specs))), thread_name_prefix='batch') as executor:
+        futures = {executor.submit(worker, spec): (index, spec) for index, spec in enumerate(specs)}
+        for future in as_completed(futures):
+            index, spec = futures[future]
+            try:
+                yield index, spec, future.result(), None
+            except Exception as e:
+                yield index, spec, None, e
+
+
+# 설정이 같은 모둠끼리 같은 대본을 받지 않도록 두 번째부터는 저장된 결과를 쓰지 않게 표시함
+def refresh_duplicates(specs, fields=('grade', 'num_people', 'duration', 'key_phrases', 'key_words', 'situation')):
+    seen = set()
+    for spec in specs:
+        config = tuple(spec.get(field) for field in fields)
+        spec['refresh'] = spec.get('refresh', False) or config in seen
+        seen.add(config)
+    return specs
+
@@ -0,0 +1,114 @@
+import json
+
+from enrole.llm import build_script_messages, routed_completion, script_max_tokens
+from enrole.parser import KO_LABELS, ScriptDocument, ScriptLine
+from enrole.translation_memory import learn_lines
+
+# 형식이 틀린 응답을 받았을 때 새로 요청해 볼 횟수
+BILINGUAL_RETRIES = 2
+BACKGROUND_FIELDS = ('When', 'Where', 'Scene')
+# JSON 키와 한국어 번역까지 들어가므로 영어 대본만 받을 때보다 출력 토큰 한도를 넉넉히 잡음
+BILINGUAL_TOKEN_FACTOR = 3
+
+# 영어 대본과 한국어 번역을 한 번에 받기 위한 JSON 형식 안내
+BILINGUAL_FORMAT = '''Return a single JSON object (no markdown) with the English script and its Korean translation, using easy words suitable for elementary school students in both languages:
+{"characters": [{"name": "Sumi", "name_ko": "수미", "en": "An active and curious student.", "ko": "활발하고 호기심 많은 학생."}],
+ "background": {"when": {"en": "...", "ko": "..."}, "where": {"en": "...", "ko": "..."}, "scene": {"en": "...", "ko": "..."}},
+ "lines": [{"speaker": "Sumi", "en": "Hello, everyone!", "ko": "안녕, 얘들아!"}]}
+"speaker" must be one of the character names, written exactly as in "characters". "name_ko" is the name written in Korean.'''
+
+
+def build_bilingual_messages(grade, num_people, duration, key_phrases, key_words, situations=""):
+    messages = build_script_messages(grade, num_people, duration, key_phrases, key_words, situations)
+    messages[-1] = dict(messages[-1], content=f'{messages[-1]["content"]}\n{BILINGUAL_FORMAT}')
+    return messages
+
+
+# 흔한 형식 실수(코드 블록, 앞뒤 설명, 키 이름 차이, 앞뒤 공백)를 고쳐서 dict 로 돌려줌
+# 고칠 수 없으면 ValueError
+def repair_payload(text):
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        raise ValueError("응답에서 JSON 을 찾지 못했습니다.")
+    data = json.loads(text[start:end + 1])
+    if not isinstance(data, dict):
+        raise ValueError("응답이 JSON 객체가 아닙니다.")
+
+    lines = data.get('lines', data.get('script', []))
+    data['lines'] = [{'speaker': str(line.get('speaker', line.get('name', ''))).strip(),
+                      'en': str(line.get('en', '')).strip(), 'ko': str(line.get('ko', '')).strip()}
+                     for line in lines if isinstance(line, dict)]
+    characters = data.get('characters', [])
+    data['characters'] = [{'name': str(character.get('name', '')).strip(),
+                           'name_ko': str(character.get('name_ko', '')).strip(),
+                           'en': str(character.get('en', character.get('description', ''))).strip(),
+                           'ko': str(character.get('ko', '')).strip()}
+                          for character in characters if isinstance(character, dict)]
+    background = data.get('background', {})
+    if not isinstance(background, dict):
+        background = {}
+    data['background'] = {key.lower(): value for key, value in background.items() if isinstance(value, dict)}
+    return data
+
+
+# 형식 검사. 문제 목록을 돌려주며 비어 있으면 통과
+def validate_payload(data):
+    problems = []
+    if not data['lines']:
+        problems.append("lines is empty")
+    names = {character['name'] for character in data['characters']}
+    for number, line in enumerate(data['lines'], 1):
+        if not line['speaker'] or not line['en'] or not line['ko']:
+            problems.append(f"line {number} needs speaker, en and ko")
+        elif names and line['speaker'] not in names:
+            problems.append(f"line {number} speaker {line['speaker']!r} is not a character")
+    for character in data['characters']:
+        if not character['name']:
+            problems.append("character without a name")
+    return problems
+
+
+# 검사를 통과한 JSON 을 영어/한국어 ScriptDocument 두 개로 나눔
+# 한국어 번역에는 한글 이름을 씀 (없으면 영어 이름 그대로)
+def payload_documents(data):
+    english, korean = ScriptDocument(), ScriptDocument()
+    english.has_script = korean.has_script = True
+    korean_names = {character['name']: character['name_ko'] or character['name'] for character in data['characters']}
+    for character in data['characters']:
+        english.characters.append((character['name'], character['en']))
+        korean.characters.append((korean_names[character['name']], character['ko'] or character['en']))
+    for field in BACKGROUND_FIELDS:
+        value = data['background'].get(field.lower())
+        if value and value.get('en'):
+            english.background.append((field, value['en']))
+            korean.background.append((field, value.get('ko') or value['en']))
+    english.lines = [ScriptLine(line['speaker'], line['en']) for line in data['lines']]
+    korean.lines = [ScriptLine(korean_names.get(line['speaker'], line['speaker']), line['ko']) for line in data['lines']]
+    return english, korean
+
+
+# 대본과 번역을 한 번의 호출로 받아 (영어 대본, 한국어 번역) 문자열로 돌려줌
+# 형식이 틀리면 고쳐 보고, 그래도 안 되면 캐시를 건너뛰고 다시 요청함. 끝내 실패하면 ValueError
+def generate_bilingual_with_gpt(grade, num_people, duration, key_phrases, key_words, situations="", refresh=False,
+                                memory=None, model=None):
+    messages = build_bilingual_messages(grade, num_people, duration, key_phrases, key_words, situations)
+    problems = []
+    for attempt in range(BILINGUAL_RETRIES + 1):
+        content = routed_completion('script', model, messages=messages, refresh=refresh or attempt > 0,
+                                    response_format={"type": "json_object"},
+                                    max_tokens=BILINGUAL_TOKEN_FACTOR * script_max_tokens(duration, num_people))
+        try:
+            data = repair_payload(content)
+        except ValueError as e:
+            problems = [str(e)]
+            continue
+        problems = validate_payload(data)
+        if not problems:
+            break
+    else:
+        raise ValueError(f"대본 형식이 올바르지 않습니다: {'; '.join(problems[:3])}")
+
+    english, korean = payload_documents(data)
+    if memory is not None:
+        learn_lines(memory, english.lines, korean.lines, origin='gpt')
+    return english.render(), korean.render(KO_LABELS)
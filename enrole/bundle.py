@@ -0,0 +1,120 @@
+import csv
+import io
+import re
+import time
+import zipfile
+
+from enrole.duration import mp3_seconds
+from enrole.metrics import timed
+from enrole.parser import parse_script
+from enrole.tts import synthesize_lines
+
+# 수업용 묶음(ZIP): 영어/한국어 대본, 전체 음성, 인물별 음성, 대사 시간표
+# ZIP 을 조각(bytes)으로 흘려보내므로 파일을 디스크에 쓰지 않음
+# 조각을 하나씩 쓰는 쪽(CLI)은 여러 대본을 묶어도 한 대본 분량만 메모리에 둠. 화면은 다운로드 버튼 때문에 bundle_bytes 로 모두 이어 붙임
+
+# 이미 압축된 MP3 는 다시 압축하지 않음
+STORED_SUFFIXES = ('.mp3',)
+UNSAFE_NAME = re.compile(r'[^\w.-]+')
+
+
+# ZipFile 이 쓰는 내용을 모아 두었다가 꺼내 가게 하는 버퍼. tell/seek 이 없어서 ZipFile 이 스트리밍 모드로 씀
+class ZipChunks(io.RawIOBase):
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+# (파일 이름, bytes 또는 bytes 를 돌려주는 함수) 목록을 받아 ZIP 조각을 차례로 돌려줌
+# 함수로 넘긴 항목은 그 차례가 되었을 때 만들어지고, 쓰고 나면 바로 버려짐
+def iter_zip(entries):
+    buffer = ZipChunks()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            if callable(data):
+                data = data()
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            compression = zipfile.ZIP_STORED if name.endswith(STORED_SUFFIXES) else zipfile.ZIP_DEFLATED
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = compression
+            with archive.open(info, 'w') as file:
+                file.write(data)
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+# 파일/폴더 이름으로 쓸 수 있게 바꿈. '..' 처럼 점만 남는 이름은 쓰지 않음
+def safe_name(text, default='role'):
+    return UNSAFE_NAME.sub('_', text.strip()).strip('_.') or default
+
+
+# 대사 시간표 CSV: 전체 음성에서의 시작/끝과, 그 인물 음성에서의 시작/끝(초)
+def timing_csv(document, translated_document, durations):
+    korean = [line.text for line in translated_document.lines] if len(translated_document.lines) == len(document.lines) else []
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['line', 'speaker', 'start', 'end', 'role_start', 'role_end', 'en', 'ko'])
+    elapsed, role_elapsed = 0.0, {}
+    for number, (line, seconds) in enumerate(zip(document.lines, durations), 1):
+        role_start = role_elapsed.get(line.speaker, 0.0)
+        writer.writerow([number, line.speaker, f'{elapsed:.2f}', f'{elapsed + seconds:.2f}', f'{role_start:.2f}',
+                         f'{role_start + seconds:.2f}', line.text, korean[number - 1] if korean else ''])
+        elapsed += seconds
+        role_elapsed[line.speaker] = role_start + seconds
+    # 엑셀에서 한글이 깨지지 않도록 BOM 을 붙임
+    return '\ufeff' + out.getvalue()
+
+
+# 대본 하나의 묶음 항목. audio=True 이면 대사를 한꺼번에(동시에, 캐시 사용) 합성해서
+# 전체 음성과 인물별 음성(그 인물의 대사만 순서대로)을 만듦
+def script_entries(script, translated, prefix='', audio=True):
+    yield f'{prefix}script_en.txt', script
+    yield f'{prefix}script_ko.txt', translated
+    if not audio:
+        return
+    document = parse_script(script)
+    if not document.lines:
+        return
+    with timed('bundle_audio', lines=len(document.lines)) as event:
+        parts = synthesize_lines(document.texts(), lang='en')
+        event['bytes'] = sum(map(len, parts))
+    yield f'{prefix}audio/all.mp3', b''.join(parts)
+    for number, speaker in enumerate(document.speakers(), 1):
+        track = b''.join(part for line, part in zip(document.lines, parts) if line.speaker == speaker)
+        yield f'{prefix}audio/{number:02d}_{safe_name(speaker)}.mp3', track
+    yield f'{prefix}timing.csv', timing_csv(document, parse_script(translated), [mp3_seconds(part) for part in parts])
+
+
+def iter_script_bundle(script, translated, audio=True):
+    return iter_zip(script_entries(script, translated, audio=audio))
+
+
+# 일괄 생성 결과 [(spec, 대본, 번역), ...] 를 모둠별 폴더로 묶음. 실패한 모둠(대본이 None)은 건너뜀
+# results 는 목록이 아니라 반복자여도 됨 (CLI 는 파일에서 하나씩 읽어 넘김)
+def iter_batch_bundle(results, audio=True):
+    def entries():
+        for number, (_, script, translated) in enumerate(results, 1):
+            if script is not None:
+                yield from script_entries(script, translated, f'group_{number:02d}/', audio)
+    return iter_zip(entries())
+
+
+# 다운로드 버튼처럼 bytes 전체가 필요한 곳에서 씀
+def bundle_bytes(chunks):
+    with timed('bundle') as event:
+        data = b''.join(chunks)
+        event['bytes'] = len(data)
+    return data
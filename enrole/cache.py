@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from enrole.llm_client import get_llm_client
+from enrole.metrics import stage_metrics
+from enrole.router import get_router
+from enrole.singleflight import get_singleflight
+from enrole.usage import usage_stats
+
+# 캐시 파일을 저장할 기본 폴더 (환경 변수로 바꿀 수 있음)
+CACHE_DIR = os.getenv('ENROLE_CACHE_DIR', '.cache')
+
+
+# 공백 차이 때문에 같은 요청이 다른 키가 되지 않도록 줄 끝 공백을 정리
+def normalize_text(text):
+    return '\n'.join(line.strip() for line in str(text).strip().split('\n'))
+
+
+# 모델, 프롬프트 메시지, 파라미터로 캐시 키(sha256)를 만듦
+def make_key(model, messages, **params):
+    payload = {
+        'model': model,
+        'messages': [{'role': m['role'], 'content': normalize_text(m['content'])} for m in messages],
+        'params': {k: v for k, v in sorted(params.items()) if v is not None},
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# 메모리 LRU + 디스크 2단 캐시. 값은 bytes 로 저장함
+class TwoTierCache:
+    def __init__(self, directory, max_items=256, ttl=7 * 24 * 3600, max_disk_bytes=100 * 1024 * 1024):
+        self.directory = directory
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.disk_bytes = None
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return self.memory[key]
+
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, 'rb') as file:
+                value = file.read()
+        except OSError:
+            with self.lock:
+                self.stats['misses'] += 1
+            return None
+
+        with self.lock:
+            self.stats['disk_hits'] += 1
+            self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        with self.lock:
+            self._remember(key, value)
+            self.stats['writes'] += 1
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(value)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            if self.disk_bytes is None:
+                self.disk_bytes = self._scan_disk_bytes()
+            else:
+                self.disk_bytes += len(value)
+            if self.disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_disk_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    # 만료된 파일부터 지우고, 그래도 크면 오래된 순서로 용량의 80%까지 지움
+    def _evict_disk(self):
+        now = time.time()
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_disk_bytes * 0.8
+        for mtime, size, path in entries:
+            if total <= target and now - mtime <= self.ttl:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.stats['evictions'] += 1
+        self.disk_bytes = total
+
+    def clear_memory(self):
+        with self.lock:
+            self.memory.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, memory_items=len(self.memory))
+
+
+# 프로세스 전체(모든 Streamlit 세션)가 이름별로 하나의 캐시를 같이 씀
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name, **options):
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = TwoTierCache(os.path.join(CACHE_DIR, name), **options)
+        return _caches[name]
+
+
+def llm_cache():
+    return get_cache('llm')
+
+
+# 캐시를 거치지 않고 모델을 한 번 호출해서 content 문자열을 돌려줌 (토큰 수와 걸린 시간을 기록)
+# task('situation', 'script', 'translate')를 넘기면 모델 선택기에도 지연 시간과 성공 여부를 알려 줌
+def request_chat_choices(model, messages, task=None, **params):
+    started = time.perf_counter()
+    try:
+        response = get_llm_client().chat(model, messages, task=task, **params)
+    except Exception:
+        elapsed = time.perf_counter() - started
+        if task:
+            get_router().observe(task, model, elapsed, ok=False)
+        stage_metrics().record('llm', elapsed, False, task=task, model=model, cache='miss')
+        raise
+    elapsed = time.perf_counter() - started
+    if task:
+        get_router().observe(task, model, elapsed)
+    choices = response['choices']
+    usage = response.get('usage') or {}
+    usage_stats().record(model, usage, elapsed, choices[0].get('finish_reason'))
+    contents = [choice['message']['content'] for choice in choices]
+    stage_metrics().record('llm', elapsed, task=task, model=model, cache='miss',
+                           bytes=sum(len(content.encode('utf-8')) for content in contents), choices=len(contents),
+                           prompt_tokens=usage.get('prompt_tokens', 0), completion_tokens=usage.get('completion_tokens', 0))
+    return contents
+
+
+def request_chat_completion(model, messages, task=None, **params):
+    return request_chat_choices(model, messages, task, **params)[0]
+
+
+# ChatCompletion 결과(content 문자열)를 캐시해서 돌려줌. refresh=True 이면 캐시를 무시하고 새로 만든 뒤 저장
+# 캐시에 없는 같은 요청이 여러 세션에서 동시에 오면 한 번만 호출하고 결과를 나눠 가짐
+# (refresh=True 는 일부러 새 결과를 원하는 요청이므로 합치지 않음)
+def cached_chat_completion(model, messages, refresh=False, task=None, **params):
+    cache = llm_cache()
+    key = make_key(model, messages, **params)
+    if not refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            stage_metrics().record('llm', 0.0, task=task, model=model, cache='hit', bytes=len(cached))
+            return cached.decode('utf-8')
+
+    def fetch():
+        content = request_chat_completion(model, messages, task, **params)
+        cache.set(key, content.encode('utf-8'))
+        return content
+
+    if refresh:
+        return fetch()
+    return get_singleflight('llm').do(key, fetch)
+
+
+# n 개의 답을 한 번의 호출로 받아 목록으로 돌려줌 (입력 토큰은 한 번만 냄). 목록 전체를 JSON 으로 캐시함
+def cached_chat_choices(model, messages, n, refresh=False, task=None, **params):
+    cache = llm_cache()
+    key = make_key(model, messages, n=n, **params)
+    if not refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            stage_metrics().record('llm', 0.0, task=task, model=model, cache='hit', bytes=len(cached), choices=n)
+            return json.loads(cached.decode('utf-8'))
+
+    def fetch():
+        contents = request_chat_choices(model, messages, task, n=n, **params)
+        cache.set(key, json.dumps(contents, ensure_ascii=False).encode('utf-8'))
+        return contents
+
+    if refresh:
+        return fetch()
+    return get_singleflight('llm').do(key, fetch)
+
+
+# 스트리밍 버전. 캐시에 있으면 한 번에 돌려주고, 없으면 조각을 그대로 흘려보낸 뒤 끝까지 받은 결과만 저장
+# 같은 요청이 이미 스트리밍 중이면 그쪽이 끝날 때까지 기다렸다가 전체를 한 번에 돌려줌
+def cached_chat_completion_stream(model, messages, refresh=False, task=None, **params):
+    cache = llm_cache()
+    key = make_key(model, messages, **params)
+    flights = get_singleflight('llm')
+    flight, leader = None, False
+    if not refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            stage_metrics().record('llm', 0.0, task=task, model=model, cache='hit', bytes=len(cached))
+            yield cached.decode('utf-8')
+            return
+        flight, leader = flights.begin(key)
+        if not leader:
+            shared = flights.wait(flight)
+            if shared is not None:
+                yield shared
+                return
+
+    content = None
+    try:
+        # include_usage: 마지막 조각에 토큰 수가 실려 옴 (캐시 키에는 넣지 않음)
+        started = time.perf_counter()
+        response = get_llm_client().chat_stream(model, messages, stream_options={'include_usage': True}, **params)
+        parts = []
+        usage = finish_reason = first_token_seconds = None
+        for chunk in response:
+            if chunk.get('usage'):
+                usage = chunk['usage']
+            if chunk.get('choices'):
+                choice = chunk['choices'][0]
+                finish_reason = choice.get('finish_reason') or finish_reason
+                part = choice['delta'].get('content') or ''
+                if first_token_seconds is None and part:
+                    first_token_seconds = time.perf_counter() - started
+                parts.append(part)
+                yield part
+        elapsed = time.perf_counter() - started
+        if task:
+            get_router().observe(task, model, elapsed)
+        usage_stats().record(model, usage, elapsed, finish_reason, first_token_seconds)
+        content = ''.join(parts)
+        cache.set(key, content.encode('utf-8'))
+        usage = usage or {}
+        stage_metrics().record('llm', elapsed, task=task, model=model, cache='miss', stream=True,
+                               bytes=len(content.encode('utf-8')), first_token_seconds=first_token_seconds,
+                               prompt_tokens=usage.get('prompt_tokens', 0), completion_tokens=usage.get('completion_tokens', 0))
+    except Exception as e:
+        if task:
+            get_router().observe(task, model, time.perf_counter() - started, ok=False)
+        stage_metrics().record('llm', time.perf_counter() - started, False, task=task, model=model, cache='miss', stream=True)
+        if leader:
+            flights.finish(key, flight, error=e)
+            leader = False
+        raise
+    finally:
+        # 화면이 다시 실행되어 스트림이 중간에 멈췄으면 결과 없이 끝내서, 기다리던 쪽이 직접 호출하게 함
+        if leader:
+            flights.finish(key, flight, content)
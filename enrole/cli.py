@@ -0,0 +1,168 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+
+from enrole.batch import BATCH_WORKERS, refresh_duplicates, run_batch
+from enrole.bundle import iter_batch_bundle, safe_name
+from enrole.llm import configure_openai
+from enrole.metrics import start_metrics_server
+from enrole.pipeline import download_audio, generate_group_script
+
+# 수업 설정 파일(CSV/JSONL)의 열 이름. 줄여 쓴 이름도 받아 줌
+FIELDS = ('grade', 'num_people', 'duration', 'key_phrases', 'key_words', 'situation')
+ALIASES = {'people': 'num_people', 'phrases': 'key_phrases', 'words': 'key_words', 'situations': 'situation'}
+DEFAULTS = {'grade': '6th', 'num_people': 3, 'duration': 30, 'key_phrases': '', 'key_words': '', 'situation': ''}
+CHECKPOINT_NAME = 'checkpoint.jsonl'
+
+
+def read_specs(path):
+    with open(path, encoding='utf-8-sig', newline='') as file:
+        if os.path.splitext(path)[1].lower() in ('.jsonl', '.json'):
+            rows = [json.loads(line) for line in file if line.strip()]
+        else:
+            rows = list(csv.DictReader(file))
+
+    specs = []
+    seen = {}
+    for number, row in enumerate(rows, 1):
+        spec = dict(DEFAULTS)
+        for key, value in row.items():
+            key = ALIASES.get(key, key)
+            if key in FIELDS and value not in (None, ''):
+                spec[key] = value
+        spec['num_people'] = int(spec['num_people'])
+        spec['duration'] = int(spec['duration'])
+        # id 는 출력 폴더 이름이 되므로 경로를 벗어나지 못하게 바꾸고, 겹치면 서로 덮어쓰므로 받지 않음
+        spec['id'] = safe_name(str(row.get('id') or ''), f'{number:04d}')
+        if spec['id'] in seen:
+            raise ValueError(f"{number}번째 설정의 id '{spec['id']}' 가 {seen[spec['id']]}번째 설정과 겹칩니다.")
+        seen[spec['id']] = number
+        specs.append(spec)
+    return specs
+
+
+# 설정이 바뀌면 같은 id 라도 다시 만들도록 설정 내용의 해시를 체크포인트에 함께 남김
+# --bilingual 로 만든 결과는 따로 봄 (기존 체크포인트가 그대로 맞도록 기본 방식일 때는 넣지 않음)
+def spec_digest(spec):
+    values = [spec[field] for field in FIELDS] + (['bilingual'] if spec.get('bilingual') else [])
+    raw = json.dumps(values, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def load_checkpoint(path):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 중간에 끊겨 반쯤 쓴 줄은 무시
+            done[record['id']] = record['digest']
+    return done
+
+
+def write_file(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_outputs(output_dir, spec, script, translated, audio):
+    spec_dir = os.path.join(output_dir, spec['id'])
+    os.makedirs(spec_dir, exist_ok=True)
+    write_file(os.path.join(spec_dir, 'spec.json'),
+               json.dumps({field: spec[field] for field in FIELDS}, ensure_ascii=False, indent=2).encode('utf-8'))
+    write_file(os.path.join(spec_dir, 'script.txt'), script.encode('utf-8'))
+    write_file(os.path.join(spec_dir, 'translated.txt'), translated.encode('utf-8'))
+    audio_path = os.path.join(spec_dir, 'audio.mp3')
+    if audio is not None:
+        write_file(audio_path, audio)
+    elif os.path.exists(audio_path):
+        # 예전 대본의 음성이 새 대본 옆에 남지 않도록 지움
+        os.remove(audio_path)
+
+
+def read_text(path):
+    with open(path, encoding='utf-8') as file:
+        return file.read()
+
+
+# 출력 폴더에 있는 대본을 하나씩 읽어 묶음 ZIP 을 조각 단위로 씀 (대본이 많아도 한 대본 분량만 메모리에 둠)
+def write_bundle(output_dir, specs, audio):
+    def results():
+        for spec in specs:
+            spec_dir = os.path.join(output_dir, spec['id'])
+            if os.path.exists(os.path.join(spec_dir, 'translated.txt')):
+                yield spec, read_text(os.path.join(spec_dir, 'script.txt')), read_text(os.path.join(spec_dir, 'translated.txt'))
+
+    path = os.path.join(output_dir, 'bundle.zip')
+    with open(f'{path}.tmp', 'wb') as file:
+        for chunk in iter_batch_bundle(results(), audio):
+            file.write(chunk)
+    os.replace(f'{path}.tmp', path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m enrole',
+        description='Generate role-play scripts, Korean translations and audio for a CSV/JSONL file of lesson specs.')
+    parser.add_argument('specs', help='CSV or JSONL file with grade, num_people, duration, key_phrases, key_words, situation (and optional id)')
+    parser.add_argument('-o', '--output', default='output', help='output directory (default: output)')
+    parser.add_argument('-j', '--workers', type=int, default=BATCH_WORKERS, help='number of specs processed at the same time')
+    parser.add_argument('--no-audio', action='store_true', help='skip text-to-speech')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and process every spec again')
+    parser.add_argument('--refresh', action='store_true', help='bypass the response cache')
+    parser.add_argument('--bilingual', action='store_true', help='get the script and its translation from one JSON-mode call')
+    parser.add_argument('--bundle', action='store_true',
+                        help='also write OUT/bundle.zip with both scripts, per-character audio and a line timing table for every spec')
+    args = parser.parse_args(argv)
+
+    try:
+        configure_openai()
+        specs = read_specs(args.specs)
+    except (OSError, ValueError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 2
+    start_metrics_server()
+    for spec in specs:
+        spec['refresh'] = args.refresh
+        spec['bilingual'] = args.bilingual
+    refresh_duplicates(specs)
+
+    os.makedirs(args.output, exist_ok=True)
+    checkpoint_path = os.path.join(args.output, CHECKPOINT_NAME)
+    done = {} if args.restart else load_checkpoint(checkpoint_path)
+    todo = [spec for spec in specs if done.get(spec['id']) != spec_digest(spec)]
+    print(f'{len(specs)} specs, {len(specs) - len(todo)} already done, {len(todo)} to process', file=sys.stderr)
+
+    def worker(spec):
+        script, translated = generate_group_script(spec)
+        audio = None if args.no_audio else download_audio(script)
+        return script, translated, audio
+
+    failures = 0
+    started = time.perf_counter()
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+        for _, spec, result, error in run_batch(todo, worker, args.workers):
+            if error is not None:
+                failures += 1
+                print(f'[{spec["id"]}] failed: {error}', file=sys.stderr)
+                continue
+            write_outputs(args.output, spec, *result)
+            # 결과 파일을 다 쓴 뒤에만 체크포인트에 남겨서, 중간에 멈춰도 다음 실행에서 이어서 만듦
+            checkpoint.write(json.dumps({'id': spec['id'], 'digest': spec_digest(spec), 'finished': time.time()}) + '\n')
+            checkpoint.flush()
+            print(f'[{spec["id"]}] done', file=sys.stderr)
+
+    print(f'finished in {time.perf_counter() - started:.1f}s, {failures} failed', file=sys.stderr)
+    if args.bundle:
+        print(f'wrote {write_bundle(args.output, specs, not args.no_audio)}', file=sys.stderr)
+    return 1 if failures else 0
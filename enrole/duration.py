@@ -0,0 +1,127 @@
+from collections import Counter
+
+from enrole.llm import LINE_PAUSE, WORDS_PER_SECOND, request_script_continuation, translate_lines_gpt
+from enrole.parser import KO_LABELS, parse_line, parse_script
+from enrole.tts import audio_cache, line_key, strip_id3
+
+# 목표 길이와 이 정도 차이는 맞는 것으로 봄 (비율, 최소 초)
+DURATION_TOLERANCE = 0.15
+MIN_TOLERANCE_SECONDS = 5
+
+# MPEG 오디오 프레임 헤더 표 (Layer III 만 사용)
+MP3_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),   # MPEG-1
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),       # MPEG-2
+    0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),       # MPEG-2.5
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def line_seconds(text):
+    return len(text.split()) / WORDS_PER_SECOND + LINE_PAUSE
+
+
+# MP3 프레임 헤더를 따라가며 재생 시간을 더함 (디코딩 없이 헤더만 읽음)
+def mp3_seconds(data):
+    data = strip_id3(data)
+    position, seconds = 0, 0.0
+    while position + 4 <= len(data):
+        if data[position] != 0xFF or data[position + 1] & 0xE0 != 0xE0:
+            position += 1
+            continue
+        version = (data[position + 1] >> 3) & 3
+        layer = (data[position + 1] >> 1) & 3
+        bitrate_index = data[position + 2] >> 4
+        rate_index = (data[position + 2] >> 2) & 3
+        padding = (data[position + 2] >> 1) & 1
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            position += 1
+            continue
+        sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+        samples = 1152 if version == 3 else 576
+        seconds += samples / sample_rate
+        position += samples // 8 * MP3_BITRATES[version][bitrate_index] * 1000 // sample_rate + padding
+    return seconds
+
+
+# 대사마다 읽는 데 걸리는 시간(초) 목록과 기준을 돌려줌
+# 모든 대사의 음성이 이미 만들어져 있으면 실제 음성 길이를, 아니면 단어 수로 어림한 값을 씀
+def line_durations(document, lang='en'):
+    cache = audio_cache()
+    audio = [cache.get(line_key(line.text, lang)) for line in document.lines]
+    if audio and None not in audio:
+        seconds = [mp3_seconds(data) for data in audio]
+        # 프레임을 읽을 수 없는 음성이 섞여 있으면 단어 수로 어림함
+        if all(seconds):
+            return seconds, 'audio'
+    return [line_seconds(line.text) for line in document.lines], 'words'
+
+
+def spoken_seconds(document, lang='en'):
+    durations, source = line_durations(document, lang)
+    return sum(durations), source
+
+
+def target_range(target_seconds):
+    margin = max(MIN_TOLERANCE_SECONDS, target_seconds * DURATION_TOLERANCE)
+    return target_seconds - margin, target_seconds + margin
+
+
+# 줄일 때 뺄 대사 번호. 첫 줄과 마지막 줄, 인물마다 마지막 남은 한 줄은 남기고 끝에서부터 뺌
+def trim_indexes(document, seconds, target_seconds):
+    low, high = target_range(target_seconds)
+    total = sum(seconds)
+    counts = Counter(line.speaker for line in document.lines)
+    drop = set()
+    for index in range(len(document.lines) - 2, 0, -1):
+        if total <= high:
+            break
+        speaker = document.lines[index].speaker
+        if counts[speaker] <= 1 or total - seconds[index] < low:
+            continue
+        drop.add(index)
+        total -= seconds[index]
+        counts[speaker] -= 1
+    return drop
+
+
+# 대본 길이가 목표에서 벗어나면 짧을 때는 이어 쓰고(새 대사만 번역), 길 때는 대사를 빼서 맞춤
+# (대본, 번역, 'ok' | 'extended' | 'trimmed') 를 돌려줌
+def fit_script(script, translated, target_seconds, refresh=False, memory=None):
+    document = parse_script(script)
+    translated_document = parse_script(translated)
+    if not document.lines:
+        return script, translated, 'ok'
+    durations, _ = line_durations(document)
+    seconds = sum(durations)
+    low, high = target_range(target_seconds)
+
+    if seconds < low:
+        average = seconds / len(document.lines)
+        extra_lines = max(1, round((target_seconds - seconds) / average))
+        new_lines = request_script_continuation(script, extra_lines, document.speakers(), refresh)
+        if not new_lines:
+            return script, translated, 'ok'
+        new_translation = translate_lines_gpt([line.render() for line in new_lines], document.header(), refresh, memory)
+        document.lines.extend(new_lines)
+        if translated_document.has_script:
+            translated_document.lines.extend(line for line in map(parse_line, new_translation) if line is not None)
+            return document.render(), translated_document.render(KO_LABELS), 'extended'
+        return document.render(), translated.rstrip() + '\n' + '\n'.join(new_translation), 'extended'
+
+    if seconds > high:
+        drop = trim_indexes(document, durations, target_seconds)
+        if not drop:
+            return script, translated, 'ok'
+        kept = [line for index, line in enumerate(document.lines) if index not in drop]
+        # 번역 줄 수가 원문과 같을 때만 같은 번호를 빼고, 어긋나 있으면 남은 대사를 다시 번역(번역 메모리 사용)
+        if len(translated_document.lines) == len(document.lines):
+            translated_document.lines = [line for index, line in enumerate(translated_document.lines) if index not in drop]
+        else:
+            translated_document.has_script = True
+            translated_document.lines = [line for line in map(parse_line, translate_lines_gpt(
+                [line.render() for line in kept], document.header(), refresh, memory)) if line is not None]
+        document.lines = kept
+        return document.render(), translated_document.render(KO_LABELS), 'trimmed'
+
+    return script, translated, 'ok'
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from array import array
+
+from enrole.cache import CACHE_DIR
+from enrole.metrics import timed
+from enrole.parser import parse_script
+
+# 만든 대본과 번역을 입력 설정과 함께 모아 두는 SQLite 보관함
+# 주요 표현/단어/상황이 비슷한 예전 대본을 찾아, 새로 만들기 전에 바로 쓸 수 있게 보여줌
+LIBRARY_PATH = os.getenv('ENROLE_LIBRARY_PATH', os.path.join(CACHE_DIR, 'library.sqlite3'))
+# 이 유사도(0~1)보다 낮은 대본은 보여주지 않음
+LIBRARY_MIN_SIMILARITY = float(os.getenv('ENROLE_LIBRARY_MIN_SIMILARITY', '0.35'))
+LIBRARY_MATCHES = 3
+# 전문 검색으로 고를 후보 수와, 검색어가 안 맞아도 함께 비교할 최근 대본 수 (한국어 조사 때문에 단어가 안 맞는 경우)
+FTS_CANDIDATES = 100
+RECENT_CANDIDATES = 200
+
+# MinHash 서명 길이와 문자 shingle 길이
+MINHASH_PERMUTATIONS = 64
+SHINGLE_CHARS = 3
+MINHASH_PRIME = (1 << 61) - 1
+_random = random.Random(20240501)
+MINHASH_COEFFICIENTS = [(_random.randrange(1, MINHASH_PRIME), _random.randrange(0, MINHASH_PRIME))
+                        for _ in range(MINHASH_PERMUTATIONS)]
+# 항목별 비중. 주요 표현이 같아야 수업에 그대로 쓸 수 있으므로 가장 크게 봄
+FIELD_WEIGHTS = {'key_phrases': 0.45, 'key_words': 0.35, 'situation': 0.2}
+
+WORDS = re.compile(r"[\w']+")
+QUOTES = str.maketrans({'’': "'", '‘': "'", '“': '"', '”': '"'})
+
+
+def normalize_terms(text):
+    return WORDS.findall((text or '').translate(QUOTES).casefold())
+
+
+# 쉼표/줄바꿈으로 나눈 항목마다 단어와 문자 3-gram 을 모음
+# "What's wrong?" 와 "whats wrong" 처럼 표기가 조금 달라도 겹치는 shingle 이 많게 함
+def shingles(text):
+    result = set()
+    for item in re.split(r'[,\n]', text or ''):
+        terms = normalize_terms(item)
+        result.update(terms)
+        joined = ' '.join(terms)
+        result.update(joined[i:i + SHINGLE_CHARS] for i in range(max(0, len(joined) - SHINGLE_CHARS + 1)))
+    return result
+
+
+def minhash(values):
+    if not values:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+              for value in values]
+    return array('Q', (min((a * h + b) % MINHASH_PRIME for h in hashes) for a, b in MINHASH_COEFFICIENTS))
+
+
+# 두 서명에서 같은 자리의 값이 같은 비율 = Jaccard 유사도 추정치
+def estimate_similarity(left, right):
+    if left is None or right is None:
+        return 0.0
+    return sum(x == y for x, y in zip(left, right)) / len(left)
+
+
+def load_signature(blob):
+    return array('Q', blob) if blob else None
+
+
+# FTS5 질의문. 단어마다 따옴표로 감싸서 특수 문자를 그대로 찾게 하고 OR 로 묶음
+def fts_query(*texts):
+    terms = dict.fromkeys(term for text in texts for term in normalize_terms(text) if len(term) > 1)
+    return ' OR '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+class ScriptLibrary:
+    def __init__(self, path=LIBRARY_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS library ('
+            ' id INTEGER PRIMARY KEY, grade TEXT, num_people INTEGER, duration INTEGER,'
+            ' key_phrases TEXT, key_words TEXT, situation TEXT,'
+            ' script TEXT NOT NULL, translated TEXT NOT NULL, script_hash TEXT NOT NULL UNIQUE,'
+            ' phrases_sig BLOB, words_sig BLOB, situation_sig BLOB,'
+            ' uses INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL)'
+        )
+        # FTS5 가 없는 SQLite 에서는 최근 대본만 MinHash 로 비교함
+        try:
+            self.connection.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS library_fts USING fts5(key_phrases, key_words, situation)')
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+        self.connection.commit()
+        self.stats = {'searches': 0, 'offered': 0, 'reused': 0, 'stored': 0}
+
+    # 새 대본을 저장하고 id 를 돌려줌. 같은 대본이 이미 있으면 그 id
+    def add(self, grade, num_people, duration, key_phrases, key_words, situation, script, translated):
+        script_hash = hashlib.sha256(script.encode('utf-8')).hexdigest()
+        signatures = [minhash(shingles(text)) for text in (key_phrases, key_words, situation)]
+        with self.lock:
+            cursor = self.connection.execute(
+                'INSERT OR IGNORE INTO library (grade, num_people, duration, key_phrases, key_words, situation,'
+                ' script, translated, script_hash, phrases_sig, words_sig, situation_sig, created)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [grade, num_people, duration, key_phrases, key_words, situation, script, translated, script_hash]
+                + [signature.tobytes() if signature is not None else None for signature in signatures] + [time.time()],
+            )
+            if cursor.rowcount:
+                script_id = cursor.lastrowid
+                if self.fts:
+                    self.connection.execute(
+                        'INSERT INTO library_fts (rowid, key_phrases, key_words, situation) VALUES (?, ?, ?, ?)',
+                        (script_id, key_phrases, key_words, situation))
+                self.stats['stored'] += 1
+            else:
+                script_id = self.connection.execute('SELECT id FROM library WHERE script_hash = ?',
+                                                    (script_hash,)).fetchone()[0]
+            self.connection.commit()
+        return script_id
+
+    def candidate_ids(self, key_phrases, key_words, situation):
+        ids = set()
+        query = fts_query(key_phrases, key_words, situation)
+        if self.fts and query:
+            ids.update(row[0] for row in self.connection.execute(
+                'SELECT rowid FROM library_fts WHERE library_fts MATCH ? ORDER BY rank LIMIT ?', (query, FTS_CANDIDATES)))
+        ids.update(row[0] for row in self.connection.execute(
+            'SELECT id FROM library ORDER BY id DESC LIMIT ?', (RECENT_CANDIDATES,)))
+        return ids
+
+    # 인원수가 같은 대본 가운데 비슷한 순서로 최대 limit 개를 돌려줌. exclude_script(지금 보고 있는 대본)는 빼고 찾음
+    # 비교할 입력(표현, 단어, 상황)이 하나도 없으면 빈 목록
+    def search(self, num_people, key_phrases, key_words, situation, limit=LIBRARY_MATCHES,
+               min_similarity=LIBRARY_MIN_SIMILARITY, exclude_script=''):
+        query = {'key_phrases': minhash(shingles(key_phrases)), 'key_words': minhash(shingles(key_words)),
+                 'situation': minhash(shingles(situation))}
+        weights = {field: weight for field, weight in FIELD_WEIGHTS.items() if query[field] is not None}
+        if not weights:
+            return []
+        exclude_hash = hashlib.sha256(exclude_script.encode('utf-8')).hexdigest() if exclude_script else ''
+        with timed('library_search') as event, self.lock:
+            ids = list(self.candidate_ids(key_phrases, key_words, situation))
+            rows = []
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows += self.connection.execute(
+                    'SELECT id, grade, num_people, duration, key_phrases, key_words, situation, script, translated,'
+                    ' uses, phrases_sig, words_sig, situation_sig FROM library'
+                    f' WHERE num_people = ? AND script_hash != ? AND id IN ({",".join("?" * len(chunk))})',
+                    [num_people, exclude_hash] + chunk).fetchall()
+            self.stats['searches'] += 1
+            event['candidates'] = len(rows)
+
+        total = sum(weights.values())
+        matches = []
+        for row in rows:
+            stored = dict(zip(('key_phrases', 'key_words', 'situation'), map(load_signature, row[10:13])))
+            score = sum(weight * estimate_similarity(query[field], stored[field]) for field, weight in weights.items()) / total
+            if score >= min_similarity:
+                matches.append(dict(zip(('id', 'grade', 'num_people', 'duration', 'key_phrases', 'key_words',
+                                         'situation', 'script', 'translated', 'uses'), row[:10]), score=score))
+        matches.sort(key=lambda match: (-match['score'], -match['uses'], -match['id']))
+        return matches[:limit]
+
+    # 제안을 보여준 횟수. 화면이 다시 그려질 때마다 찾으므로 세는 일은 부르는 쪽이 입력이 바뀌었을 때만 함
+    def record_offer(self):
+        with self.lock:
+            self.stats['offered'] += 1
+
+    def record_use(self, script_id):
+        with self.lock:
+            self.connection.execute('UPDATE library SET uses = uses + 1 WHERE id = ?', (script_id,))
+            self.connection.commit()
+            self.stats['reused'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            size = self.connection.execute('SELECT COUNT(*) FROM library').fetchone()[0]
+            return dict(self.stats, entries=size)
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+# 프로세스 전체가 하나의 보관함을 같이 씀
+def get_library():
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = ScriptLibrary()
+        return _library
+
+
+# 대사가 있는 대본만 보관함에 넣음 (형식이 깨진 응답은 다시 보여줄 가치가 없음)
+def remember_script(grade, num_people, duration, key_phrases, key_words, situation, script, translated):
+    if not parse_script(script).lines:
+        return None
+    return get_library().add(grade, num_people, duration, key_phrases, key_words, situation, script, translated)
@@ -0,0 +1,228 @@
+import os
+
+import openai
+from dotenv import load_dotenv
+
+from enrole.cache import cached_chat_choices, cached_chat_completion, cached_chat_completion_stream
+from enrole.parser import KO_LABELS, ScriptDocument, parse_line, parse_script
+from enrole.router import get_router
+from enrole.translation_memory import learn_lines, prefill_lines
+
+
+
+# .env 파일을 읽고 OpenAI API 키를 설정함. 키가 없으면 ValueError
+# 가져오기(import)만 할 때는 부르지 않으므로 Streamlit 밖에서도 모듈을 쓸 수 있음
+def configure_openai(api_key=None):
+    load_dotenv()
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        raise ValueError("OpenAI API key not found. Please set the OPENAI_API_KEY environment variable.")
+    openai.api_key = api_key
+    return api_key
+
+
+# model 을 정하지 않으면 모델 선택기가 작업('situation', 'script', 'translate')마다 지연 목표를 지키는 모델을 고름
+def routed_completion(task, model, **request):
+    if model:
+        return cached_chat_completion(model=model, task=task, **request)
+    return get_router().run(task, lambda routed: cached_chat_completion(model=routed, task=task, **request))
+
+
+# routed_completion 과 같지만 n 개의 답을 목록으로 받음
+def routed_choices(task, model, n, **request):
+    if model:
+        return cached_chat_choices(model=model, n=n, task=task, **request)
+    return get_router().run(task, lambda routed: cached_chat_choices(model=routed, n=n, task=task, **request))
+
+
+# ChatGPT API 호출 함수
+def generate_situation_with_gpt(num_people, refresh=False, model=None):
+    return routed_completion(
+        'situation', model,
+        refresh=refresh,
+    messages=[
+        {"role": "system",
+        "content": "You are a knowledgeable theater teacher with a knack for humor and creativity."},
+        {"role": "user", "content": f"In one short sentence(in 15 words), provide a unique background and situation in Korean for {num_people} people to role play. role can be adults not only students.(ex)우주선 고장으로 조난 당한 긴박한 상황."}
+    ]
+    )
+
+# 대본 생성 프롬프트의 고정 부분 (역할, 형식, 예시)
+# 요청마다 바뀌는 값은 넣지 않아서 제공자 쪽 프롬프트 캐시가 이 앞부분을 다시 쓸 수 있음
+SCRIPT_SYSTEM_PROMPT = """You are a skilled playwright specializing in role-playing scripts as a teacher. You excel at writing scripts with easy words, especially for elementary school students. You can write engaging role-play scripts using educationally appropriate words and situations that help students to use the key expressions in an interesting way.
+You write role-play scripts for Korean elementary school students. A line in the script takes 4~5 seconds. Give every role a balanced part in the script.
+The format of the script is 'name:line'. Return scripts only.
+#script example (make a script like this example's format. Same format, different content.)
+[Characters]
+1. Sumi: An active and curious student.
+2. Jin: A calm and inquisitive student.
+3. Minho: A student interested in history.
+4. Hana: A responsible student who takes care of her friends.
+
+[Backgrounds]
+When: Monday morning, right before the field trip.
+Where: In the classroom and on the school bus.
+Scene: Elementary school students are getting ready for a field trip to the museum.
+They are discussing what they want to see and are excited about the trip.
+
+[script]
+Sumi: Hello, everyone! How are you today?
+Jin: I'm good, thank you. How about you, Sumi?
+Minho: I'm excited! We have a field trip today.
+Hana: Yes, we are going to the museum. What do you want to see first?
+Sumi: I want to see the dinosaur bones!
+Jin: Me too! Dinosaurs are so cool."""
+
+# 초등학생이 영어 대사를 읽는 속도(초당 단어 수)와 대사 사이에 쉬는 시간(초)
+# 길이 어림(enrole.duration)과 프롬프트의 줄 수, 출력 토큰 한도가 모두 이 값을 씀
+WORDS_PER_SECOND = float(os.getenv('ENROLE_WORDS_PER_SECOND', '2.5'))
+LINE_PAUSE = float(os.getenv('ENROLE_LINE_PAUSE', '0.5'))
+# 프롬프트에서 요청하는 대사 한 줄의 단어 수. 이 길이로 한 줄이 4초 남짓 걸림
+WORDS_PER_LINE = 9
+SECONDS_PER_LINE = WORDS_PER_LINE / WORDS_PER_SECOND + LINE_PAUSE
+# 출력 토큰 한도 계산용 어림값
+TOKENS_PER_LINE = 30
+TOKENS_PER_CHARACTER = 30
+HEADER_TOKENS = 120
+
+
+# 목표 길이(초)를 채우는 대사 줄 수
+def script_line_count(duration):
+    return max(1, round(duration / SECONDS_PER_LINE))
+
+
+# 대본 길이(초)와 인원으로 출력 토큰 한도를 정함 (10초짜리 요청이 끝없이 길어지지 않도록)
+def script_max_tokens(duration, num_people):
+    # 조금 길게 써도 잘리지 않도록 어림한 줄 수보다 한 줄 더 잡음
+    lines = script_line_count(duration) + 1
+    return HEADER_TOKENS + num_people * TOKENS_PER_CHARACTER + lines * TOKENS_PER_LINE
+
+
+# 대본 생성 프롬프트 (일반 호출과 스트리밍 호출이 함께 사용). 요청마다 바뀌는 값은 맨 끝의 user 메시지에만 둠
+def build_script_messages(grade, num_people, duration, key_phrases, key_words, situations=""):
+    situation = "" if situations == "" else f"\n({situations}) is The setting for the scenario you are creating. Reflect it in the background of the role-play scenario."
+    messages = [
+        {"role": "system", "content": SCRIPT_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Create a role-play script for {grade} grade students. The script should play for {duration} seconds (about {script_line_count(duration)} lines of about {WORDS_PER_LINE} words each). Include {num_people} balanced roles in the script. Include Key phrases: {key_phrases} and Key words: {key_words}.{situation}"}
+    ]
+    return messages
+
+# ChatGPT API 호출 함수
+def generate_script_with_gpt(grade, num_people, duration, key_phrases, key_words, situations="", refresh=False, model=None):
+    return routed_completion(
+        'script', model,
+        messages=build_script_messages(grade, num_people, duration, key_phrases, key_words, situations),
+        max_tokens=script_max_tokens(duration, num_people),
+        refresh=refresh
+    )
+
+# 한 번의 호출(n 개 샘플)로 서로 다른 대본 여러 개를 받음. 번역은 고른 대본만 나중에 함
+def generate_script_variants_with_gpt(grade, num_people, duration, key_phrases, key_words, situations="", variants=3, refresh=False, model=None):
+    return routed_choices(
+        'script', model, variants,
+        messages=build_script_messages(grade, num_people, duration, key_phrases, key_words, situations),
+        max_tokens=script_max_tokens(duration, num_people),
+        refresh=refresh
+    )
+
+# ChatGPT API 스트리밍 호출 함수 (토큰이 도착하는 대로 조각을 돌려줌)
+def generate_script_with_gpt_stream(grade, num_people, duration, key_phrases, key_words, situations="", refresh=False, model=None):
+    return cached_chat_completion_stream(
+        model=model or get_router().choose('script'),
+        task='script',
+        messages=build_script_messages(grade, num_people, duration, key_phrases, key_words, situations),
+        max_tokens=script_max_tokens(duration, num_people),
+        refresh=refresh
+    )
+
+def request_script_translation(script, refresh=False, model=None):
+    return routed_completion(
+        'translate', model,
+        temperature=0.0,             # 일관된 번역을 위해 0.0 고정 (같은 입력이면 결과도 같아 캐시 가능)
+        refresh=refresh,
+    messages=[
+    {"role": "system",
+    "content": "You are a skilled playwright specializing in translating role-playing scripts for elementary school students. Your expertise is in using simple, educationally appropriate language that engages young learners. You excel at translating English scripts to Korean, maintaining the original context and simplicity."},
+    {"role": "user", "content": f'Please translate the following script to Korean, maintaining the same format and context. Ensure that the translation uses easy words suitable for elementary school students.\n{script}'}
+    ]
+    )
+
+# memory(번역 메모리)를 넘기면 이미 번역해 본 대사는 메모리에서 채우고 남은 대사만 모델에 보냄
+def translate_gpt(script, refresh=False, memory=None, model=None):
+    document = parse_script(script) if memory is not None else None
+    if document is None or not document.lines:
+        return request_script_translation(script, refresh, model)
+
+    filled = [None] * len(document.lines) if refresh else prefill_lines(memory, document.lines)
+    missing = [line for line, done in zip(document.lines, filled) if done is None]
+    if len(missing) == len(document.lines):
+        translated = request_script_translation(script, refresh, model)
+        learn_lines(memory, document.lines, parse_script(translated).lines, origin='gpt')
+        return translated
+
+    # 머리말(등장인물/배경)과 메모리에 없는 대사만 번역
+    partial = ScriptDocument()
+    partial.has_script = True
+    partial.characters = document.characters
+    partial.background = document.background
+    partial.lines = missing
+    if partial.header() or missing:
+        translated_document = parse_script(request_script_translation(partial.render(), refresh, model))
+    else:
+        translated_document = ScriptDocument()
+    if len(translated_document.lines) != len(missing):
+        return request_script_translation(script, refresh, model)
+
+    learn_lines(memory, missing, translated_document.lines, origin='gpt')
+    new_lines = iter(translated_document.lines)
+    translated_document.lines = [next(new_lines) if done is None else done for done in filled]
+    return translated_document.render(KO_LABELS)
+
+# 대사 몇 줄만 번역하는 함수 (스트리밍 중 완성된 줄을 바로 번역할 때 사용)
+# characters 에 등장인물/배경 원문을 넘기면 이름을 일관되게 번역함
+def request_lines_translation(lines, characters="", refresh=False, model=None):
+    joined = '\n'.join(lines)
+    context = "" if characters == "" else f'For reference, this is the beginning of the script (do not translate it):\n{characters}\n\n'
+    content = routed_completion(
+        'translate', model,
+        temperature=0.0,
+        refresh=refresh,
+    messages=[
+    {"role": "system",
+    "content": "You are a skilled playwright specializing in translating role-playing scripts for elementary school students. Your expertise is in using simple, educationally appropriate language that engages young learners. You excel at translating English scripts to Korean, maintaining the original context and simplicity."},
+    {"role": "user", "content": f"{context}Please translate the following {len(lines)} script lines to Korean. Keep the 'name: line' format, one output line per input line in the same order, and return the translated lines only. Ensure that the translation uses easy words suitable for elementary school students.\n{joined}"}
+    ]
+    )
+
+    return [line.strip() for line in content.split('\n') if line.strip()]
+
+def translate_lines_gpt(lines, characters="", refresh=False, memory=None, model=None):
+    source = [parse_line(line) for line in lines]
+    if memory is None or None in source:
+        return request_lines_translation(lines, characters, refresh, model)
+
+    filled = [None] * len(source) if refresh else prefill_lines(memory, source)
+    missing = [i for i, done in enumerate(filled) if done is None]
+    if missing:
+        translated = request_lines_translation([lines[i] for i in missing], characters, refresh, model)
+        translated_lines = [parse_line(line) for line in translated]
+        if len(translated_lines) != len(missing) or None in translated_lines:
+            # 줄이 어긋나면 메모리 없이 전체를 번역한 결과를 씀
+            return translated if len(missing) == len(lines) else request_lines_translation(lines, characters, refresh, model)
+        learn_lines(memory, [source[i] for i in missing], translated_lines, origin='gpt')
+        for i, line in zip(missing, translated_lines):
+            filled[i] = line
+    return [line.render() for line in filled]
+
+# 짧게 나온 대본 뒤에 이어질 대사만 새로 받음 (대본 전체를 다시 만들지 않음)
+def request_script_continuation(script, extra_lines, speakers, refresh=False, model=None):
+    content = routed_completion(
+        'script', model,
+        refresh=refresh,
+        max_tokens=extra_lines * TOKENS_PER_LINE + HEADER_TOKENS,
+    messages=[
+        {"role": "system", "content": SCRIPT_SYSTEM_PROMPT},
+        {"role": "user", "content": f"This role-play script is too short:\n{script}\n\nContinue the conversation from its last line with about {extra_lines} more lines and bring the scene to a natural end. Use only these characters: {', '.join(speakers)}. Return the new lines only, in 'name:line' format."}
+    ]
+    )
+    return [line for line in (parse_line(text) for text in content.split('\n')) if line is not None]
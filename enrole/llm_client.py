@@ -0,0 +1,200 @@
+import os
+import random
+import threading
+import time
+
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+
+# 이 프로세스가 동시에 보낼 수 있는 모델 요청 수와, 자리가 날 때까지 기다리는 최대 시간(초)
+LLM_MAX_CONCURRENCY = int(os.getenv('ENROLE_LLM_MAX_CONCURRENCY', '8'))
+LLM_QUEUE_TIMEOUT = float(os.getenv('ENROLE_LLM_QUEUE_TIMEOUT', '30'))
+# 동시에 읽고 있을 수 있는 스트리밍 응답 수. 스트림은 응답이 시작되면 위의 자리를 돌려주고 이 자리만 잡고 있음
+# (스트림이 자리를 다 차지해서 그 스트림을 번역하는 요청이 자리를 못 얻는 일이 없도록)
+LLM_MAX_STREAMS = int(os.getenv('ENROLE_LLM_MAX_STREAMS', os.getenv('ENROLE_LLM_MAX_CONCURRENCY', '8')))
+# 요청 한 번의 제한 시간과, 재시도를 포함한 호출 전체의 제한 시간(초)
+LLM_TIMEOUT = float(os.getenv('ENROLE_LLM_TIMEOUT', '60'))
+LLM_DEADLINE = float(os.getenv('ENROLE_LLM_DEADLINE', '150'))
+LLM_RETRIES = int(os.getenv('ENROLE_LLM_RETRIES', '4'))
+# 모델별 분당 요청 수 한도. "gpt-4.1=500,gpt-4.1-mini=1000" 형식이고 '*' 는 나머지 모델
+LLM_RPM = os.getenv('ENROLE_LLM_RPM', '*=500')
+
+# 이미 만들고 있는 대본에 딸린 요청(번역). 자리가 날 때까지 호출 제한 시간만큼 기다리고 LLM_QUEUE_TIMEOUT 으로 거절하지 않음
+# (공유 자리는 짧은 요청만 잡으므로 곧 나고, 여기서 거절하면 이미 받은 대본까지 버리게 됨)
+FOLLOW_UP_TASKS = ('translate',)
+
+# 잠시 뒤 다시 시도하면 되는 OpenAI 오류 (요청 한도 초과, 서버 일시 오류 등)
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.ServiceUnavailableError,
+    openai.error.APIError,
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+)
+
+
+# 화면에 그대로 보여줄 수 있는 모델 호출 실패. 기존 화면 코드가 ValueError 를 잡으므로 그 하위 클래스로 둠
+class LLMError(ValueError):
+    pass
+
+
+def parse_rpm(text):
+    limits = {}
+    for item in text.split(','):
+        model, _, rpm = item.partition('=')
+        if rpm.strip():
+            limits[model.strip()] = float(rpm)
+    return limits
+
+
+# 토큰 버킷. 초당 rate 개씩 채워지고 최대 capacity 개까지 모아 둘 수 있음
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # 토큰 하나를 얻을 때까지 기다림. deadline(time.monotonic 기준)까지 못 얻으면 False
+    def acquire(self, deadline):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+# 모든 모델 호출이 같이 쓰는 클라이언트
+# HTTP 연결 재사용, 모델별 요청 속도 제한, 동시 요청 수 제한, 지수 백오프 재시도, 호출별 제한 시간을 맡음
+class LLMClient:
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT, deadline=LLM_DEADLINE,
+                 retries=LLM_RETRIES, queue_timeout=LLM_QUEUE_TIMEOUT, rpm=LLM_RPM, base_delay=1.0, max_delay=20.0,
+                 max_streams=LLM_MAX_STREAMS):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.queue_timeout = queue_timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limits = parse_rpm(rpm)
+        self.buckets = {}
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.stream_slots = threading.BoundedSemaphore(max_streams)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'rejected': 0, 'failures': 0}
+
+        # openai 0.28 은 스레드마다 세션을 새로 만들기 때문에, 모든 스레드가 연결을 같이 쓰도록 세션 하나를 넘겨줌
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_concurrency + max_streams)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def install(self):
+        openai.requestssession = self.session
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def _bucket(self, model):
+        with self.lock:
+            if model not in self.buckets:
+                rpm = self.limits.get(model, self.limits.get('*', 500))
+                self.buckets[model] = TokenBucket(rpm / 60, max(1, rpm / 6))
+            return self.buckets[model]
+
+    # 속도 제한과 동시 요청 수 자리를 얻음. 얻지 못하면 LLMError
+    def _enter(self, model, deadline, queue_timeout):
+        if not self._bucket(model).acquire(deadline):
+            self._count('throttled')
+            raise LLMError("요청이 너무 많아 잠시 기다려야 합니다. 조금 뒤에 다시 시도해 주세요.")
+        if not self.slots.acquire(timeout=max(0, min(queue_timeout, deadline - time.monotonic()))):
+            self._count('rejected')
+            raise LLMError("지금 대본을 만드는 사람이 많습니다. 조금 뒤에 다시 시도해 주세요.")
+        self._count('requests')
+
+    def _retry_delay(self, error, attempt):
+        retry_after = (getattr(error, 'headers', None) or {}).get('retry-after')
+        try:
+            return min(self.max_delay, float(retry_after))
+        except (TypeError, ValueError):
+            return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    # 요청을 보내고 재시도 가능한 오류면 기다렸다가 다시 보냄. stream=True 이면 응답(조각 반복자)을 돌려줌
+    def _create(self, model, messages, deadline, queue_timeout, **params):
+        for attempt in range(self.retries + 1):
+            self._enter(model, deadline, queue_timeout)
+            try:
+                remaining = deadline - time.monotonic()
+                response = openai.ChatCompletion.create(model=model, messages=messages,
+                                                        request_timeout=max(1.0, min(self.timeout, remaining)), **params)
+            except RETRYABLE_ERRORS as e:
+                self.slots.release()
+                quota = getattr(e, 'code', None) == 'insufficient_quota'
+                delay = self._retry_delay(e, attempt)
+                if quota or attempt == self.retries or time.monotonic() + delay > deadline:
+                    self._count('failures')
+                    raise LLMError(f"AI 서버가 응답하지 않습니다. 잠시 후 다시 시도해 주세요. ({e})") from e
+                self._count('retries')
+                time.sleep(delay)
+                continue
+            except openai.error.OpenAIError as e:
+                self.slots.release()
+                self._count('failures')
+                raise LLMError(f"AI 요청이 실패했습니다: {e}") from e
+            except BaseException:
+                self.slots.release()
+                raise
+            self.slots.release()
+            return response
+
+    def chat(self, model, messages, deadline=None, task=None, **params):
+        deadline = time.monotonic() + (deadline or self.deadline)
+        queue_timeout = deadline - time.monotonic() if task in FOLLOW_UP_TASKS else self.queue_timeout
+        return self._create(model, messages, deadline, queue_timeout, **params)
+
+    # 스트리밍은 조각을 다 받을 때까지 스트림 자리를 잡고 있음
+    def chat_stream(self, model, messages, deadline=None, **params):
+        deadline = time.monotonic() + (deadline or self.deadline)
+        if not self.stream_slots.acquire(timeout=max(0, min(self.queue_timeout, deadline - time.monotonic()))):
+            self._count('rejected')
+            raise LLMError("지금 대본을 만드는 사람이 많습니다. 조금 뒤에 다시 시도해 주세요.")
+        try:
+            response = self._create(model, messages, deadline, self.queue_timeout, stream=True, **params)
+        except BaseException:
+            self.stream_slots.release()
+            raise
+        try:
+            yield from response
+        # 읽는 도중의 시간 초과나 끊긴 연결은 openai 오류가 아니라 requests 오류로 올라옴
+        except (openai.error.OpenAIError, requests.exceptions.RequestException) as e:
+            self._count('failures')
+            raise LLMError(f"AI 서버 응답이 중간에 끊겼습니다. 다시 시도해 주세요. ({e})") from e
+        finally:
+            self.stream_slots.release()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+            _client.install()
+        return _client
@@ -0,0 +1,174 @@
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 단계별 기록을 한 줄씩 남길 JSONL 파일. 경로를 정했을 때만 남김
+METRICS_LOG = os.getenv('ENROLE_METRICS_LOG', '')
+# 파일이 이 크기를 넘으면 <파일>.1 로 옮기고 새로 씀 (이전 파일은 하나만 남김)
+METRICS_LOG_MAX_BYTES = int(os.getenv('ENROLE_METRICS_LOG_MAX_BYTES', str(50 * 1024 * 1024)))
+# 기록을 모아 두었다가 이만큼 쌓이거나 이 시간이 지나면 한꺼번에 씀
+LOG_BUFFER_LINES = 200
+LOG_FLUSH_SECONDS = 5
+# Prometheus 형식 지표를 내보낼 포트 (빈 값이면 열지 않음)
+METRICS_PORT = os.getenv('ENROLE_METRICS_PORT', '')
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+# 단계(llm, translate, parse, tts, tts_line, script_file ...)별 호출 수, 오류, 걸린 시간, 크기, 캐시 적중을 모음
+class StageMetrics:
+    def __init__(self, log_path=METRICS_LOG):
+        self.log_path = log_path
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.log_lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.pending = []
+        self.flushed = time.monotonic()
+
+    def record(self, stage, seconds, ok=True, **fields):
+        with self.lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = {'calls': 0, 'errors': 0, 'seconds': 0.0, 'bytes': 0, 'cache_hits': 0,
+                                              'tokens': 0, 'buckets': [0] * len(SECONDS_BUCKETS)}
+            stats['calls'] += 1
+            stats['errors'] += not ok
+            stats['seconds'] += seconds
+            stats['bytes'] += fields.get('bytes', 0)
+            stats['cache_hits'] += fields.get('cache') == 'hit'
+            stats['tokens'] += fields.get('prompt_tokens', 0) + fields.get('completion_tokens', 0)
+            for index, bound in enumerate(SECONDS_BUCKETS):
+                if seconds <= bound:
+                    stats['buckets'][index] += 1
+        if self.log_path:
+            line = json.dumps(dict(ts=round(time.time(), 3), stage=stage, seconds=round(seconds, 4), ok=ok, **fields),
+                              ensure_ascii=False)
+            with self.log_lock:
+                self.pending.append(line)
+                if len(self.pending) < LOG_BUFFER_LINES and time.monotonic() - self.flushed < LOG_FLUSH_SECONDS:
+                    return
+                lines, self.pending = self.pending, []
+                self.flushed = time.monotonic()
+            # 파일 쓰기는 버퍼를 넘겨받은 스레드만 하고, 다른 스레드는 기다리지 않고 계속 버퍼에 쌓음
+            self.write_log(lines)
+
+    def flush(self):
+        with self.log_lock:
+            lines, self.pending = self.pending, []
+            self.flushed = time.monotonic()
+        if lines:
+            self.write_log(lines)
+
+    def write_log(self, lines):
+        data = ''.join(line + '\n' for line in lines)
+        with self.write_lock:
+            os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+            try:
+                size = os.path.getsize(self.log_path)
+            except OSError:
+                size = 0
+            if size and size + len(data) > METRICS_LOG_MAX_BYTES:
+                os.replace(self.log_path, self.log_path + '.1')
+            with open(self.log_path, 'a', encoding='utf-8') as file:
+                file.write(data)
+
+    def snapshot(self):
+        with self.lock:
+            return {stage: dict(stats, buckets=list(stats['buckets'])) for stage, stats in self.stages.items()}
+
+    # Prometheus text exposition 형식
+    def prometheus(self):
+        lines = ['# TYPE enrole_stage_seconds histogram']
+        snapshot = self.snapshot()
+        for stage, stats in sorted(snapshot.items()):
+            for bound, count in zip(SECONDS_BUCKETS, stats['buckets']):
+                lines.append(f'enrole_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'enrole_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {stats["calls"]}')
+            lines.append(f'enrole_stage_seconds_sum{{stage="{stage}"}} {stats["seconds"]:.6f}')
+            lines.append(f'enrole_stage_seconds_count{{stage="{stage}"}} {stats["calls"]}')
+        for name, key in (('errors', 'errors'), ('bytes', 'bytes'), ('cache_hits', 'cache_hits'), ('tokens', 'tokens')):
+            lines.append(f'# TYPE enrole_stage_{name}_total counter')
+            lines.extend(f'enrole_stage_{name}_total{{stage="{stage}"}} {stats[key]}'
+                         for stage, stats in sorted(snapshot.items()))
+        return '\n'.join(lines) + '\n'
+
+
+_metrics = StageMetrics()
+# 끝날 때 버퍼에 남은 기록을 씀
+atexit.register(_metrics.flush)
+
+
+def stage_metrics():
+    return _metrics
+
+
+# with timed('tts', bytes=...) as event: 처럼 감싸면 걸린 시간과 오류 여부를 기록함
+# event 에 값을 넣으면 함께 기록됨 (예: event['bytes'] = len(audio))
+@contextmanager
+def timed(stage, **fields):
+    started = time.perf_counter()
+    ok = True
+    try:
+        yield fields
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        _metrics.record(stage, time.perf_counter() - started, ok, **fields)
+
+
+# 한 번의 요청을 cProfile 로 잡아 상위 함수 목록을 문자열로 남김 (이 스레드에서 실행된 코드만 잡힘)
+@contextmanager
+def profiled(enabled=True, limit=30):
+    report = {}
+    if not enabled:
+        yield report
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        report['text'] = out.getvalue()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = _metrics.prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+# 백그라운드 스레드에서 /metrics 를 내보내는 HTTP 서버를 한 번만 띄움
+def start_metrics_server(port=METRICS_PORT, host='127.0.0.1'):
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+        return _server
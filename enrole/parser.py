@@ -0,0 +1,169 @@
+import re
+
+# 대본의 구역 표시. 영어 원문과 한국어 번역 양쪽의 표기를 모두 인식함
+SECTION_PATTERN = re.compile(r'\[\s*(characters?|backgrounds?|scripts?|등장인물|배경|대본)\s*\]', re.IGNORECASE)
+SECTION_NAMES = {
+    'character': 'characters', 'characters': 'characters', '등장인물': 'characters',
+    'background': 'background', 'backgrounds': 'background', '배경': 'background',
+    'script': 'script', 'scripts': 'script', '대본': 'script',
+}
+NUMBERING_PATTERN = re.compile(r'^\s*\d+\s*[.)]\s*')
+
+EN_LABELS = ('[Characters]', '[Backgrounds]', '[script]')
+KO_LABELS = ('[등장인물]', '[배경]', '[대본]')
+KO_FIELDS = {'When': '언제', 'Where': '어디서', 'Scene': '장면'}
+
+
+class ScriptLine:
+    __slots__ = ('speaker', 'text')
+
+    def __init__(self, speaker, text):
+        self.speaker = speaker
+        self.text = text
+
+    def __repr__(self):
+        return f'ScriptLine({self.speaker!r}, {self.text!r})'
+
+    def __eq__(self, other):
+        return isinstance(other, ScriptLine) and (self.speaker, self.text) == (other.speaker, other.text)
+
+    def render(self):
+        return f'{self.speaker}: {self.text}'
+
+
+# 파싱된 대본. 등장인물 [(이름, 설명)], 배경 [(항목, 내용)], 대사 [ScriptLine] 을 순서대로 가짐
+class ScriptDocument:
+    __slots__ = ('characters', 'background', 'lines', 'has_script')
+
+    def __init__(self):
+        self.characters = []
+        self.background = []
+        self.lines = []
+        self.has_script = False
+
+    def speakers(self):
+        return list(dict.fromkeys(line.speaker for line in self.lines))
+
+    def texts(self):
+        return [line.text for line in self.lines]
+
+    def dialogue(self):
+        return [line.render() for line in self.lines]
+
+    def header(self, labels=EN_LABELS):
+        parts = []
+        if self.characters:
+            parts.append(labels[0])
+            parts.extend(f'{i}. {name}: {description}' for i, (name, description) in enumerate(self.characters, 1))
+            parts.append('')
+        if self.background:
+            # 한국어 구역 표시로 그릴 때는 배경 항목 이름도 한국어로 바꿈
+            fields = KO_FIELDS if labels == KO_LABELS else {}
+            parts.append(labels[1])
+            parts.extend(f'{fields.get(field, field)}: {value}' if field else value for field, value in self.background)
+            parts.append('')
+        return '\n'.join(parts).strip()
+
+    def render(self, labels=EN_LABELS):
+        header = self.header(labels)
+        body = '\n'.join([labels[2]] + self.dialogue())
+        return f'{header}\n\n{body}' if header else body
+
+
+# 조각 단위로 들어오는 대본을 한 번만 훑으면서 ScriptDocument 를 채우는 파서
+# feed() 는 새로 완성된 항목을 ('header', 머리말 원문) 또는 ('line', ScriptLine) 으로 돌려줌
+class ScriptParser:
+    __slots__ = ('document', 'section', 'buffer', 'header_lines')
+
+    def __init__(self):
+        self.document = ScriptDocument()
+        self.section = None
+        self.buffer = ''
+        self.header_lines = []
+
+    def _handle_line(self, line):
+        events = []
+        match = SECTION_PATTERN.search(line) if '[' in line else None
+        if match:
+            section = SECTION_NAMES[match.group(1).lower()]
+            if section == 'script' and not self.document.has_script:
+                self.header_lines.append(line[:match.start()])
+                events.append(('header', '\n'.join(self.header_lines).strip()))
+                self.document.has_script = True
+            elif not self.document.has_script:
+                self.header_lines.append(line)
+            self.section = section
+            line = line[match.end():]
+            if not line.strip():
+                return events
+        elif not self.document.has_script:
+            self.header_lines.append(line)
+
+        stripped = line.strip()
+        if not stripped:
+            return events
+        section = self.section
+        if section == 'script':
+            # 이름 뒤 첫 번째 콜론에서만 나눠서 대사 안의 콜론을 보존함
+            script_line = parse_line(stripped)
+            if script_line is not None:
+                self.document.lines.append(script_line)
+                events.append(('line', script_line))
+        elif section == 'characters':
+            name, _, description = NUMBERING_PATTERN.sub('', stripped).partition(':')
+            self.document.characters.append((name.strip().strip('*').strip(), description.strip()))
+        elif section == 'background':
+            field, colon, value = stripped.partition(':')
+            background = self.document.background
+            if colon and len(field) <= 20:
+                background.append((field.strip().strip('*').strip(), value.strip()))
+            elif background:
+                # 콜론이 없는 줄은 앞 항목의 이어지는 내용으로 봄
+                last_field, last_value = background[-1]
+                background[-1] = (last_field, f'{last_value}\n{stripped}')
+            else:
+                background.append(('', stripped))
+        return events
+
+    def feed(self, chunk):
+        if '\n' not in chunk:
+            self.buffer += chunk
+            return []
+        self.buffer += chunk
+        *lines, self.buffer = self.buffer.split('\n')
+        events = []
+        for line in lines:
+            events.extend(self._handle_line(line))
+        return events
+
+    def close(self):
+        line, self.buffer = self.buffer, ''
+        return self._handle_line(line) if line.strip() else []
+
+
+# 'name: line' 한 줄을 ScriptLine 으로 바꿈. 대사가 아니면 None
+def parse_line(text):
+    speaker, colon, line = text.strip().partition(':')
+    line = line.strip()
+    if not colon or not line:
+        return None
+    return ScriptLine(speaker.strip().strip('*').strip(), line)
+
+
+def parse_script(text):
+    parser = ScriptParser()
+    parser.feed(text)
+    parser.close()
+    return parser.document
+
+
+# TTS 에 넘길 영어 대사만 줄바꿈으로 이어서 돌려줌
+def remove_extras(script):
+    document = script if isinstance(script, ScriptDocument) else parse_script(script)
+    if not document.has_script:
+        raise ValueError("The marker '[script]' not found in the script")
+
+    final_script = '\n'.join(document.texts()).strip()
+    if not final_script:
+        raise ValueError("Final script after removing Korean translation is empty")
+    return final_script
@@ -0,0 +1,170 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from enrole.bilingual import generate_bilingual_with_gpt
+from enrole.library import remember_script
+from enrole.llm import generate_script_with_gpt, generate_script_with_gpt_stream, translate_gpt, translate_lines_gpt
+from enrole.metrics import stage_metrics, timed
+from enrole.parser import ScriptParser, parse_script, remove_extras
+from enrole.translation_memory import get_translation_memory
+from enrole.tts import TTS_PRERENDER, cached_script_audio, prerender_lines, synthesize_script
+
+# 번역 요청 하나에 묶을 대사 줄 수와 동시에 돌릴 번역 요청 수
+# 첫 묶음은 작게 보내 번역이 빨리 보이게 하고, 그다음부터는 두 배씩 키워 긴 대본도 요청 수가 적게 함
+# (300초 대본 약 73줄: 3, 6, 12, 24, 24, 4 로 6번)
+TRANSLATE_BATCH_LINES = 3
+TRANSLATE_MAX_BATCH_LINES = 24
+TRANSLATE_WORKERS = 3
+
+
+def download_audio(script):
+    with timed('tts') as event:
+        document = parse_script(script)
+        remove_extras(document)  # 마커가 없거나 대사가 비어 있으면 ValueError
+        # 대사를 줄별로 나눠 동시에 합성하고(이미 만든 줄은 캐시 사용) 메모리에서 순서대로 이어 붙임
+        audio = synthesize_script(document.texts(), lang='en')
+        event.update(lines=len(document.lines), bytes=len(audio))
+    return audio
+
+
+# 대본이 정해지면 '음성 생성' 을 누르기 전에 백그라운드에서 줄별 음성을 만들어 둠
+# 아직 만들어지지 않은 줄 수를 돌려줌 (미리 만들기를 껐으면 None)
+def prerender_audio(script):
+    document = parse_script(script)
+    if not TTS_PRERENDER or not document.lines:
+        return None
+    return prerender_lines(document.texts(), lang='en')
+
+
+# 줄별 음성이 모두 캐시에 있으면 합성 없이 바로 이어 붙인 음성을, 아니면 None
+def ready_audio(script):
+    return cached_script_audio(parse_script(script).texts(), lang='en')
+
+
+# 파일을 쓰지 않고 다운로드할 대본 bytes 를 바로 만듦
+def download_script(script):
+    with timed('script_file') as event:
+        data = script.encode("utf-8")
+        event['bytes'] = len(data)
+    return data
+
+
+# 번역 작업 하나를 시간을 재면서 실행 (스레드 풀에서 실행됨)
+def timed_translation(func, *args, lines=0):
+    with timed('translate', lines=lines):
+        return func(*args)
+
+
+def join_translation(jobs):
+    parts = []
+    for kind, job in jobs:
+        if kind == 'header':
+            header = job.result().strip()
+            parts.append(f"{header}\n\n[대본]" if header else "[대본]")
+        elif kind == 'lines':
+            parts.append('\n'.join(job.result()))
+        else:
+            parts.append(job.result())
+    return '\n'.join(parts)
+
+
+# 대본을 스트리밍으로 받으면서, 완성된 대사는 그때그때 번역 작업으로 넘김
+# 진행 상황을 ('script', 지금까지의 대본), ('translation', 앞에서부터 끝난 번역) 으로 알려 주고
+# 마지막에 ('done', (대본, 번역)) 을 돌려줌. 화면에 그리는 일은 부르는 쪽이 함
+def iter_script_with_translation(grade, num_people, duration, key_phrases, key_words, situations="", refresh=False):
+    parser = ScriptParser()
+    script_text = ""
+    header = ""
+    pending = []
+    batch_lines = TRANSLATE_BATCH_LINES
+    jobs = []
+    shown = 0
+    started = time.perf_counter()
+    parse_seconds = 0.0
+
+    with ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS) as executor:
+        def submit_pending():
+            nonlocal batch_lines
+            if pending:
+                jobs.append(('lines', executor.submit(timed_translation, translate_lines_gpt, list(pending), header, refresh,
+                                                      get_translation_memory(), lines=len(pending))))
+                pending.clear()
+                batch_lines = min(TRANSLATE_MAX_BATCH_LINES, batch_lines * 2)
+
+        def handle(events):
+            nonlocal header
+            for kind, payload in events:
+                if kind == 'header':
+                    header = payload
+                    if payload.strip():
+                        jobs.append(('header', executor.submit(timed_translation, translate_gpt, payload, refresh)))
+                    else:
+                        # 대본이 [script] 로 바로 시작하면 번역할 머리말이 없음. [대본] 표시만 남김
+                        empty = Future()
+                        empty.set_result('')
+                        jobs.append(('header', empty))
+                else:
+                    pending.append(payload.render())
+                    # 조각 크기나 도착 시각과 상관없이 항상 같은 단위로 묶어야 번역 캐시도 맞아떨어짐
+                    if len(pending) >= batch_lines:
+                        submit_pending()
+
+        # 앞에서부터 끝난 번역까지만 순서대로 내보냄
+        def finished_translation():
+            nonlocal shown
+            done = 0
+            for _, job in jobs:
+                if not job.done():
+                    break
+                done += 1
+            if done > shown:
+                shown = done
+                return join_translation(jobs[:done])
+            return None
+
+        for chunk in generate_script_with_gpt_stream(grade, num_people, duration, key_phrases, key_words, situations, refresh):
+            script_text += chunk
+            yield 'script', script_text
+            parse_started = time.perf_counter()
+            events = parser.feed(chunk)
+            parse_seconds += time.perf_counter() - parse_started
+            handle(events)
+            translated = finished_translation()
+            if translated is not None:
+                yield 'translation', translated
+
+        handle(parser.close())
+        submit_pending()
+        stage_metrics().record('parse', parse_seconds, lines=len(parser.document.lines), bytes=len(script_text.encode('utf-8')))
+        # [script] 마커를 찾지 못했으면 기존처럼 전체를 한 번에 번역
+        if not jobs:
+            jobs.append(('full', executor.submit(timed_translation, translate_gpt, script_text, refresh)))
+        for _, job in jobs:
+            job.result()
+            translated = finished_translation()
+            if translated is not None:
+                yield 'translation', translated
+
+    translated = join_translation(jobs)
+    stage_metrics().record('generate', time.perf_counter() - started, lines=len(parser.document.lines),
+                           bytes=len(script_text.encode('utf-8')) + len(translated.encode('utf-8')))
+    # 다음에 비슷한 설정으로 만들 때 바로 보여줄 수 있게 보관함에 넣음
+    remember_script(grade, num_people, duration, key_phrases, key_words, situations, script_text, translated)
+    yield 'done', (script_text, translated)
+
+
+# 모둠 하나의 대본을 만들고 번역함 (일괄 생성과 CLI 에서 스레드 풀로 동시에 실행)
+# 요청 한도 초과 같은 일시 오류는 LLMClient 가 간격을 늘려 가며 다시 시도함
+# spec 에 bilingual=True 가 있으면 대본과 번역을 한 번의 호출로 받음
+def generate_group_script(spec):
+    if spec.get('bilingual'):
+        script, translated = generate_bilingual_with_gpt(spec['grade'], spec['num_people'], spec['duration'],
+                                                         spec['key_phrases'], spec['key_words'], spec['situation'],
+                                                         spec.get('refresh', False), get_translation_memory())
+    else:
+        script = generate_script_with_gpt(spec['grade'], spec['num_people'], spec['duration'],
+                                          spec['key_phrases'], spec['key_words'], spec['situation'], spec.get('refresh', False))
+        translated = translate_gpt(script, spec.get('refresh', False), get_translation_memory())
+    remember_script(spec['grade'], spec['num_people'], spec['duration'], spec['key_phrases'], spec['key_words'],
+                    spec['situation'], script, translated)
+    return script, translated
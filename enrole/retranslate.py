@@ -0,0 +1,46 @@
+import difflib
+
+from enrole.parser import KO_LABELS, parse_line, parse_script
+
+
+# 고친 대본을 마지막으로 번역한 원문과 줄 단위로 비교해서 바뀐 대사만 다시 번역하고,
+# 기존 번역 사이 제자리에 끼워 넣은 번역문과 다시 번역한 줄 수를 돌려줌
+# translate_lines(['name: line', ...], header) -> 같은 개수의 번역 줄
+# translate_header(머리말 원문) -> 번역된 머리말 (등장인물/배경이 바뀌었을 때만 부름)
+# 원문과 번역의 대사 수가 맞지 않아 위치를 맞출 수 없으면 None 을 돌려줌 (전체 번역 필요)
+def retranslate_changes(old_source, old_translated, new_source, translate_lines, translate_header=None):
+    old_document = parse_script(old_source)
+    old_translation = parse_script(old_translated)
+    new_document = parse_script(new_source)
+    if not new_document.has_script or len(old_document.lines) != len(old_translation.lines):
+        return None
+
+    header = new_document.header()
+    translation = old_translation
+    if header != old_document.header():
+        if translate_header is None:
+            return None
+        translation = parse_script(translate_header(header) + '\n\n[대본]')
+
+    matcher = difflib.SequenceMatcher(a=old_document.dialogue(), b=new_document.dialogue(), autojunk=False)
+    lines = []
+    changed = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            lines.extend(old_translation.lines[i1:i2])
+        elif tag in ('replace', 'insert'):
+            for j in range(j1, j2):
+                changed.append((len(lines), new_document.lines[j].render()))
+                lines.append(None)
+        # 'delete' 는 번역에서도 그 줄을 빼면 됨
+
+    if changed:
+        translated = [parse_line(line) for line in translate_lines([line for _, line in changed], header)]
+        if len(translated) != len(changed) or None in translated:
+            return None
+        for (position, _), line in zip(changed, translated):
+            lines[position] = line
+
+    translation.lines = lines
+    translation.has_script = True
+    return translation.render(KO_LABELS), len(changed)
@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger('enrole.router')
+
+# 작업별 후보 모델(앞에 둔 것을 먼저 씀)과 지연 목표(p95, 초)
+# 기본값은 지금 쓰는 모델을 맨 앞에 두어서, 그 모델이 느려지거나 오류가 많을 때만 다음 모델로 넘어감
+# 항상 싼 모델부터 쓰려면 ENROLE_MODELS_SCRIPT="gpt-4.1-mini,gpt-4.1" 처럼 순서를 바꾸면 됨
+ROUTES = {
+    'situation': (os.getenv('ENROLE_MODELS_SITUATION', 'gpt-4.1-mini'), float(os.getenv('ENROLE_SLO_SITUATION', '8'))),
+    'script': (os.getenv('ENROLE_MODELS_SCRIPT', 'gpt-4.1,gpt-4.1-mini'), float(os.getenv('ENROLE_SLO_SCRIPT', '45'))),
+    'translate': (os.getenv('ENROLE_MODELS_TRANSLATE', 'gpt-4.1,gpt-4.1-mini'), float(os.getenv('ENROLE_SLO_TRANSLATE', '30'))),
+}
+# 이 비율보다 오류가 많으면 목표를 못 지키는 것으로 봄
+MAX_ERROR_RATE = float(os.getenv('ENROLE_ROUTE_MAX_ERROR_RATE', '0.2'))
+# 이 시간(초)이 지난 기록은 버려서, 밀려났던 모델도 시간이 지나면 다시 시도함
+ROUTE_WINDOW_SECONDS = float(os.getenv('ENROLE_ROUTE_WINDOW_SECONDS', '300'))
+MIN_SAMPLES = 5
+# 0 보다 크면 첫 모델이 이 시간(초) 안에 답하지 않을 때 다음 모델에도 같은 요청을 보내고 먼저 온 답을 씀
+HEDGE_AFTER = float(os.getenv('ENROLE_ROUTE_HEDGE_AFTER', '0'))
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))] if values else 0.0
+
+
+# (작업, 모델) 별 최근 지연 시간과 오류를 보고 작업마다 목표를 지키는 첫 번째 후보 모델을 고름
+class ModelRouter:
+    def __init__(self, routes=ROUTES, max_error_rate=MAX_ERROR_RATE, window=ROUTE_WINDOW_SECONDS,
+                 hedge_after=HEDGE_AFTER, workers=8):
+        self.routes = {task: ([model.strip() for model in models.split(',') if model.strip()], target)
+                       for task, (models, target) in routes.items()}
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.hedge_after = hedge_after
+        self.samples = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hedge')
+        self.decisions = {}
+
+    # 캐시를 거치지 않은 실제 호출마다 불림 (enrole.cache)
+    def observe(self, task, model, seconds, ok=True):
+        with self.lock:
+            self.samples.setdefault((task, model), deque(maxlen=200)).append((time.monotonic(), seconds, ok))
+
+    def health(self, task, model):
+        with self.lock:
+            samples = self.samples.get((task, model), ())
+            cutoff = time.monotonic() - self.window
+            recent = [(seconds, ok) for at, seconds, ok in samples if at >= cutoff]
+        latencies = [seconds for seconds, ok in recent if ok]
+        return {
+            'count': len(recent),
+            'p50': percentile(latencies, 0.5),
+            'p95': percentile(latencies, 0.95),
+            'error_rate': sum(not ok for _, ok in recent) / len(recent) if recent else 0.0,
+        }
+
+    # 목표를 지키는 순서대로 후보를 돌려줌. 기록이 적은 모델은 지키는 것으로 봄
+    def order(self, task):
+        models, target = self.routes[task]
+        healthy, slow = [], []
+        for model in models:
+            stats = self.health(task, model)
+            meets = stats['count'] < MIN_SAMPLES or (stats['p95'] <= target and stats['error_rate'] <= self.max_error_rate)
+            (healthy if meets else slow).append((model, stats))
+        # 모두 목표를 못 지키면 그중 p95 가 가장 낮은 것부터
+        slow.sort(key=lambda item: (item[1]['error_rate'] > self.max_error_rate, item[1]['p95']))
+        ranked = healthy + slow
+        chosen, stats = ranked[0]
+        if chosen == models[0]:
+            reason = 'preferred'
+        else:
+            first = self.health(task, models[0])
+            reason = f"{models[0]} misses target: p95 {first['p95']:.1f}s errors {first['error_rate']:.0%}"
+        with self.lock:
+            changed = self.decisions.get(task) != chosen
+            self.decisions[task] = chosen
+        # 선택이 바뀔 때는 INFO, 매번의 결정은 DEBUG 로 남김
+        logger.log(logging.INFO if changed else logging.DEBUG,
+                   'route %s -> %s (%s; p50 %.1fs p95 %.1fs target %gs errors %.0f%% n=%d)', task, chosen, reason,
+                   stats['p50'], stats['p95'], target, stats['error_rate'] * 100, stats['count'])
+        return [model for model, _ in ranked]
+
+    def choose(self, task):
+        return self.order(task)[0]
+
+    # call(model) 을 고른 모델로 실행. 헤지가 켜져 있으면 느릴 때 다음 후보에도 보내고 먼저 성공한 결과를 씀
+    def run(self, task, call):
+        models = self.order(task)
+        if self.hedge_after <= 0 or len(models) < 2:
+            return call(models[0])
+
+        primary = self.executor.submit(call, models[0])
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+        logger.info('hedge %s: %s slower than %.1fs, also asking %s', task, models[0], self.hedge_after, models[1])
+        pending = {primary, self.executor.submit(call, models[1])}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def snapshot(self):
+        with self.lock:
+            decisions = dict(self.decisions)
+        return {task: dict(model=decisions.get(task, models[0]), target=target,
+                           models={model: self.health(task, model) for model in models})
+                for task, (models, target) in self.routes.items()}
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
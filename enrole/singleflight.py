@@ -0,0 +1,89 @@
+import os
+import threading
+
+# 같은 요청을 기다리는 최대 시간(초). 넘으면 기다리던 쪽이 직접 호출함
+SINGLEFLIGHT_TIMEOUT = float(os.getenv('ENROLE_SINGLEFLIGHT_TIMEOUT', '120'))
+
+
+class Flight:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# 같은 키의 요청이 동시에 들어오면 처음 것(리더)만 실제로 호출하고 나머지는 그 결과를 같이 받음
+# 리더의 오류는 기다리던 쪽에도 그대로 전달됨
+class SingleFlight:
+    def __init__(self, timeout=SINGLEFLIGHT_TIMEOUT):
+        self.timeout = timeout
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.stats = {'upstream': 0, 'shared': 0, 'timeouts': 0, 'errors': 0}
+
+    # (flight, 리더 여부) 를 돌려줌. 리더는 끝나면 반드시 finish() 를 불러야 함
+    def begin(self, key):
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = Flight()
+                self.stats['upstream'] += 1
+                return flight, True
+            self.stats['shared'] += 1
+            return flight, False
+
+    def finish(self, key, flight, result=None, error=None):
+        flight.result = result
+        flight.error = error
+        with self.lock:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+            if error is not None:
+                self.stats['errors'] += 1
+        flight.event.set()
+
+    # 리더의 결과를 기다림. 시간이 지나거나 리더가 결과 없이 멈추면 None (직접 호출하라는 뜻)
+    def wait(self, flight, timeout=None):
+        if not flight.event.wait(self.timeout if timeout is None else timeout):
+            with self.lock:
+                self.stats['timeouts'] += 1
+            return None
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def do(self, key, func, *args, timeout=None, **kwargs):
+        flight, leader = self.begin(key)
+        if not leader:
+            result = self.wait(flight, timeout)
+            return result if result is not None else func(*args, **kwargs)
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except Exception as e:
+            self.finish(key, flight, error=e)
+            flight = None
+            raise
+        finally:
+            # KeyboardInterrupt 같은 예외로 멈췄으면 결과 없이 끝내서, 기다리던 쪽이 직접 호출하게 함
+            if flight is not None:
+                self.finish(key, flight, result)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, in_flight=len(self.flights))
+
+
+# 프로세스 전체(모든 Streamlit 세션)가 이름별로 하나씩 같이 씀 ('llm', 'tts')
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def get_singleflight(name):
+    with _flights_lock:
+        if name not in _flights:
+            _flights[name] = SingleFlight()
+        return _flights[name]
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from enrole.translation_memory import normalize_sentence
+
+# 인원별로 미리 만들어 둘 상황 수와, 이 수보다 적어지면 다시 채우는 기준
+POOL_TARGET = int(os.getenv('ENROLE_SITUATION_POOL_TARGET', '5'))
+POOL_LOW_WATER = int(os.getenv('ENROLE_SITUATION_POOL_LOW_WATER', '2'))
+
+
+# '랜덤' 버튼용 상황을 인원수별로 미리 만들어 두는 프로세스 공용 풀
+# generate(num_people) 는 매번 새 상황을 만들어야 함 (캐시를 거치지 않는 호출)
+class SituationPool:
+    def __init__(self, generate, target=POOL_TARGET, low_water=POOL_LOW_WATER, recent=20, workers=2):
+        self.generate = generate
+        self.target = target
+        self.low_water = low_water
+        self.recent_size = recent
+        self.buckets = {}
+        self.recent = {}
+        self.refilling = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='situation')
+        self.refill_seconds = deque(maxlen=100)
+        self.stats = {'hits': 0, 'misses': 0, 'generated': 0, 'duplicates': 0, 'errors': 0}
+
+    def _bucket(self, num_people):
+        if num_people not in self.buckets:
+            self.buckets[num_people] = deque()
+            self.recent[num_people] = deque(maxlen=self.recent_size)
+        return self.buckets[num_people]
+
+    # 풀에서 하나를 바로 꺼내 주고, 비어 있으면 그 자리에서 만듦
+    def take(self, num_people):
+        with self.lock:
+            bucket = self._bucket(num_people)
+            situation = bucket.popleft() if bucket else None
+            if situation is not None:
+                self.stats['hits'] += 1
+                self.recent[num_people].append(normalize_sentence(situation))
+            else:
+                self.stats['misses'] += 1
+        self.warm(num_people)
+
+        if situation is None:
+            situation = self.generate(num_people)
+            with self.lock:
+                self.recent[num_people].append(normalize_sentence(situation))
+        return situation
+
+    # 기준보다 적으면 백그라운드에서 채우기 시작
+    def warm(self, num_people):
+        with self.lock:
+            bucket = self._bucket(num_people)
+            if len(bucket) >= self.low_water or num_people in self.refilling:
+                return
+            self.refilling.add(num_people)
+        self.executor.submit(self._refill, num_people)
+
+    def _refill(self, num_people):
+        try:
+            attempts = 0
+            while attempts < self.target * 2:
+                with self.lock:
+                    if len(self.buckets[num_people]) >= self.target:
+                        break
+                attempts += 1
+                started = time.perf_counter()
+                try:
+                    situation = self.generate(num_people).strip()
+                except Exception:
+                    with self.lock:
+                        self.stats['errors'] += 1
+                    break
+                elapsed = time.perf_counter() - started
+                with self.lock:
+                    self.refill_seconds.append(elapsed)
+                    self.stats['generated'] += 1
+                    # 최근에 내준 것이나 이미 풀에 있는 것과 같으면 버림
+                    key = normalize_sentence(situation)
+                    bucket = self.buckets[num_people]
+                    if not situation or key in self.recent[num_people] or key in {normalize_sentence(s) for s in bucket}:
+                        self.stats['duplicates'] += 1
+                        continue
+                    bucket.append(situation)
+        finally:
+            with self.lock:
+                self.refilling.discard(num_people)
+
+    def snapshot(self):
+        with self.lock:
+            served = self.stats['hits'] + self.stats['misses']
+            latencies = sorted(self.refill_seconds)
+            return dict(
+                self.stats,
+                hit_rate=self.stats['hits'] / served if served else 0.0,
+                refill_avg=sum(latencies) / len(latencies) if latencies else 0.0,
+                refill_p95=latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+                pooled={num_people: len(bucket) for num_people, bucket in self.buckets.items()},
+            )
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_situation_pool(generate):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SituationPool(generate)
+        return _pool
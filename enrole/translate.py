@@ -0,0 +1,125 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from googletrans import Translator
+
+from enrole.parser import KO_LABELS, ScriptDocument, ScriptLine, parse_script
+from enrole.translation_memory import get_translation_memory, normalize_sentence
+
+# 한 번의 요청에 묶어 보낼 최대 글자 수와 동시에 쓸 번역 클라이언트 수
+BATCH_CHARS = int(os.getenv('ENROLE_TRANSLATE_BATCH_CHARS', '4000'))
+POOL_SIZE = int(os.getenv('ENROLE_TRANSLATE_POOL_SIZE', '4'))
+
+
+# googletrans Translator 를 매번 만들지 않고 돌려 쓰는 풀 (각 Translator 가 HTTP 연결을 유지함)
+class TranslatorPool:
+    def __init__(self, size=POOL_SIZE, factory=Translator):
+        self.size = size
+        self.factory = factory
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def client(self):
+        try:
+            translator = self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                create = self.created < self.size
+                if create:
+                    self.created += 1
+            translator = self.factory() if create else self.idle.get()
+        try:
+            yield translator
+        finally:
+            self.idle.put(translator)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_translator_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TranslatorPool()
+        return _pool
+
+
+# 글자 수 한도 안에서 여러 문장을 한 묶음으로 나눔
+def make_batches(sentences, batch_chars=BATCH_CHARS):
+    batches, batch, size = [], [], 0
+    for sentence in sentences:
+        if batch and size + len(sentence) + 1 > batch_chars:
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(sentence)
+        size += len(sentence) + 1
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+# 한 묶음을 줄바꿈으로 이어 한 번에 번역하고, 줄 수가 어긋나면 그 묶음만 한 줄씩 다시 번역
+def translate_one_batch(pool, batch, src, dest):
+    with pool.client() as translator:
+        result = translator.translate('\n'.join(batch), src=src, dest=dest).text
+        translated = [line.strip() for line in result.split('\n')]
+        if len(translated) == len(batch):
+            return translated
+        return [translator.translate(sentence, src=src, dest=dest).text for sentence in batch]
+
+
+# 문장 목록을 번역해서 같은 순서로 돌려줌
+# 같은 문장은 한 번만 번역하고, memory 가 있으면 먼저 찾아본 뒤 새 번역을 저장함
+def translate_batch(sentences, src='en', dest='ko', memory=None, pool=None, batch_chars=BATCH_CHARS):
+    pool = pool or get_translator_pool()
+    unique = {}
+    for sentence in sentences:
+        if sentence.strip():
+            unique.setdefault(normalize_sentence(sentence), sentence.strip())
+
+    known = memory.lookup(src, dest, list(unique.values())) if memory is not None else {}
+    translated = {norm: known[sentence] for norm, sentence in unique.items() if sentence in known}
+    missing = [sentence for norm, sentence in unique.items() if norm not in translated]
+
+    batches = make_batches(missing, batch_chars)
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(pool.size, len(batches))) as executor:
+            results = list(executor.map(lambda batch: translate_one_batch(pool, batch, src, dest), batches))
+        new_pairs = [pair for batch, result in zip(batches, results) for pair in zip(batch, result)]
+        for source, target in new_pairs:
+            translated[normalize_sentence(source)] = target
+        if memory is not None:
+            memory.store(src, dest, new_pairs, origin='googletrans')
+
+    return [translated.get(normalize_sentence(sentence), sentence) if sentence.strip() else sentence
+            for sentence in sentences]
+
+
+# 대본을 한 번 파싱한 뒤 등장인물 설명, 배경, 대사만 번역하고 한국어 구역 표시로 다시 그림
+# batch=True 이면 같은 문장은 한 번만, 여러 문장을 한 요청에 묶어 번역하고 번역 메모리를 함께 씀
+def translate_script(script, src='en', dest='ko', batch=True):
+    document = parse_script(script)
+    sentences = ([description for _, description in document.characters]
+                 + [value.replace('\n', ' ') for _, value in document.background]
+                 + document.texts())
+
+    if batch:
+        results = translate_batch(sentences, src=src, dest=dest, memory=get_translation_memory())
+    else:
+        translator = Translator()
+        results = [translator.translate(sentence, src=src, dest=dest).text for sentence in sentences]
+
+    results = iter(results)
+    translated = ScriptDocument()
+    translated.has_script = document.has_script
+    translated.characters = [(name, next(results)) for name, _ in document.characters]
+    translated.background = [(field, next(results)) for field, _ in document.background]
+    translated.lines = [ScriptLine(line.speaker, next(results)) for line in document.lines]
+    return translated.render(KO_LABELS)
@@ -0,0 +1,128 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from enrole.cache import CACHE_DIR
+from enrole.parser import ScriptLine
+
+# 한 번 번역한 문장을 (원문 언어, 번역 언어, 정규화한 문장) 으로 저장해 두는 SQLite 번역 메모리
+TM_PATH = os.getenv('ENROLE_TM_PATH', os.path.join(CACHE_DIR, 'translation_memory.sqlite3'))
+
+SPACES = re.compile(r'\s+')
+QUOTES = str.maketrans({'’': "'", '‘': "'", '“': '"', '”': '"'})
+
+
+# 대소문자, 공백, 따옴표 모양이 달라도 같은 문장으로 봄
+def normalize_sentence(text):
+    return SPACES.sub(' ', text.translate(QUOTES)).strip().casefold()
+
+
+class TranslationMemory:
+    def __init__(self, path=TM_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS tm ('
+            ' src TEXT NOT NULL, dest TEXT NOT NULL, norm TEXT NOT NULL,'
+            ' source TEXT NOT NULL, target TEXT NOT NULL, origin TEXT,'
+            ' hits INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL,'
+            ' PRIMARY KEY (src, dest, norm))'
+        )
+        self.connection.commit()
+        self.stats = {'lookups': 0, 'hits': 0, 'stores': 0}
+
+    # {원문: 번역} 딕셔너리로 돌려줌. 메모리에 없는 문장은 빠짐
+    def lookup(self, src, dest, sentences):
+        keys = {}
+        for sentence in sentences:
+            keys.setdefault(normalize_sentence(sentence), []).append(sentence)
+        found = {}
+        norms = list(keys)
+        with self.lock:
+            for i in range(0, len(norms), 500):
+                chunk = norms[i:i + 500]
+                marks = ','.join('?' * len(chunk))
+                rows = self.connection.execute(
+                    f'SELECT norm, target FROM tm WHERE src = ? AND dest = ? AND norm IN ({marks})',
+                    [src, dest] + chunk,
+                ).fetchall()
+                for norm, target in rows:
+                    for sentence in keys[norm]:
+                        found[sentence] = target
+                if rows:
+                    self.connection.executemany(
+                        'UPDATE tm SET hits = hits + 1 WHERE src = ? AND dest = ? AND norm = ?',
+                        [(src, dest, norm) for norm, _ in rows],
+                    )
+            self.connection.commit()
+            self.stats['lookups'] += len(sentences)
+            self.stats['hits'] += sum(1 for sentence in sentences if sentence in found)
+        return found
+
+    def store(self, src, dest, pairs, origin=''):
+        now = time.time()
+        rows = [(src, dest, normalize_sentence(source), source.strip(), target.strip(), origin, now)
+                for source, target in pairs if source.strip() and target.strip()]
+        if not rows:
+            return
+        with self.lock:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO tm (src, dest, norm, source, target, origin, created)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+            self.connection.commit()
+            self.stats['stores'] += len(rows)
+
+    def snapshot(self):
+        with self.lock:
+            size = self.connection.execute('SELECT COUNT(*) FROM tm').fetchone()[0]
+            return dict(self.stats, entries=size)
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+# 프로세스 전체가 하나의 번역 메모리를 같이 씀
+def get_translation_memory():
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = TranslationMemory()
+        return _memory
+
+
+# 번역 메모리로 채울 수 있는 대사는 번역된 ScriptLine 으로 채우고, 못 채운 자리는 None 으로 둠
+# 대사와 말하는 사람 이름이 모두 메모리에 있어야 채움
+def prefill_lines(memory, lines, src='en', dest='ko'):
+    known = memory.lookup(src, dest, [line.text for line in lines] + [line.speaker for line in lines])
+    filled = []
+    for line in lines:
+        if line.text in known and line.speaker in known:
+            filled.append(ScriptLine(known[line.speaker], known[line.text]))
+        else:
+            filled.append(None)
+    return filled
+
+
+# 원문 대사와 번역 대사의 줄 수가 같을 때만 (대사, 이름) 쌍을 메모리에 저장
+def learn_lines(memory, source_lines, translated_lines, src='en', dest='ko', origin=''):
+    if len(source_lines) != len(translated_lines):
+        return False
+    pairs = []
+    for source, translated in zip(source_lines, translated_lines):
+        if translated is None:
+            continue
+        pairs.append((source.text, translated.text))
+        # 이름을 옮기지 않은 쌍(Jisoo→Jisoo)은 배워 둔 한글 이름을 덮어쓰므로 저장하지 않음
+        if source.speaker != translated.speaker:
+            pairs.append((source.speaker, translated.speaker))
+    memory.store(src, dest, pairs, origin)
+    return True
@@ -0,0 +1,185 @@
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from gtts import gTTS
+
+from enrole.cache import get_cache
+from enrole.metrics import stage_metrics, timed
+from enrole.singleflight import get_singleflight
+
+# 프로세스 전체에서 동시에 돌릴 음성 합성 요청 수
+TTS_WORKERS = int(os.getenv('ENROLE_TTS_WORKERS', '4'))
+# 음성 엔진: 'gtts' (Google 번역 음성, 인터넷 필요) 또는 'espeak' (espeak-ng, 오프라인)
+TTS_BACKEND = os.getenv('ENROLE_TTS_BACKEND', 'gtts')
+# 대본이 만들어지면 누르기 전에 미리 음성을 만들어 둘지 ('0' 이면 끄기)
+TTS_PRERENDER = os.getenv('ENROLE_TTS_PRERENDER', '1') != '0'
+# espeak-ng 목소리와 말하기 속도(분당 단어 수). 초등학생 듣기용으로 기본보다 조금 느리게
+ESPEAK_VOICES = {'en': os.getenv('ENROLE_ESPEAK_VOICE', 'en-us'), 'ko': 'ko'}
+ESPEAK_SPEED = int(os.getenv('ENROLE_ESPEAK_SPEED', '140'))
+ESPEAK_TIMEOUT = 30
+
+_executor = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix='tts')
+
+
+# 음성 엔진은 synthesize(text, lang) 로 MP3 bytes 를 돌려주면 됨
+# (줄별 MP3 를 이어 붙이고 프레임 헤더로 길이를 재므로 출력은 MP3 로 맞춤)
+class GTTSBackend:
+    name = 'gtts'
+
+    @staticmethod
+    def available():
+        return True
+
+    def synthesize(self, text, lang='en'):
+        buffer = io.BytesIO()
+        gTTS(text, lang=lang).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+# espeak-ng(없으면 espeak) 로 WAV 를 만들고 lame 이나 ffmpeg 로 MP3 로 바꿈. 네트워크를 쓰지 않음
+class EspeakBackend:
+    name = 'espeak'
+
+    def __init__(self):
+        self.espeak = shutil.which('espeak-ng') or shutil.which('espeak')
+        self.lame = shutil.which('lame')
+        self.ffmpeg = shutil.which('ffmpeg')
+
+    @staticmethod
+    def available():
+        return bool((shutil.which('espeak-ng') or shutil.which('espeak')) and (shutil.which('lame') or shutil.which('ffmpeg')))
+
+    def run(self, command, data=None):
+        try:
+            return subprocess.run(command, input=data, capture_output=True, check=True, timeout=ESPEAK_TIMEOUT).stdout
+        except subprocess.CalledProcessError as e:
+            raise ValueError(f"음성 합성에 실패했습니다: {e.stderr.decode('utf-8', 'replace').strip()}") from e
+        except subprocess.TimeoutExpired as e:
+            raise ValueError("음성 합성이 너무 오래 걸립니다.") from e
+
+    def synthesize(self, text, lang='en'):
+        # 대사를 인자로 넘기면 '-' 로 시작하는 대사가 옵션으로 읽히므로 표준 입력으로 넘김
+        wav = self.run([self.espeak, '-v', ESPEAK_VOICES.get(lang, lang), '-s', str(ESPEAK_SPEED), '--stdout', '--stdin'],
+                       text.encode('utf-8'))
+        if self.lame:
+            # -t: 줄마다 붙는 정보 프레임을 빼서 이어 붙여도 중간에 끼지 않게 함
+            return self.run([self.lame, '--quiet', '-t', '-b', '64', '-', '-'], wav)
+        return self.run([self.ffmpeg, '-loglevel', 'error', '-i', 'pipe:0', '-f', 'mp3', '-b:a', '64k',
+                         '-write_xing', '0', '-id3v2_version', '0', 'pipe:1'], wav)
+
+
+TTS_BACKENDS = {'gtts': GTTSBackend, 'espeak': EspeakBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+# 배포마다 ENROLE_TTS_BACKEND 로 고른 엔진을 프로세스 전체가 같이 씀
+def get_tts_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            backend_class = TTS_BACKENDS.get(TTS_BACKEND)
+            if backend_class is None:
+                raise ValueError(f"알 수 없는 음성 엔진입니다: {TTS_BACKEND} ({', '.join(TTS_BACKENDS)} 중 하나)")
+            if not backend_class.available():
+                raise ValueError(f"{TTS_BACKEND} 음성 엔진을 쓸 수 없습니다. espeak-ng 와 lame(또는 ffmpeg)을 설치해 주세요.")
+            _backend = backend_class()
+        return _backend
+
+
+# 대사 한 줄의 음성을 저장하는 캐시 (메모리 + 디스크)
+def audio_cache():
+    return get_cache('tts', max_items=512, max_disk_bytes=200 * 1024 * 1024)
+
+
+# 엔진마다 목소리가 다르므로 키에 엔진 이름을 넣음 (gtts 는 예전 캐시를 그대로 쓰도록 넣지 않음)
+def line_key(text, lang, backend=None):
+    backend = backend or TTS_BACKEND
+    prefix = '' if backend == 'gtts' else f'{backend}\n'
+    return hashlib.sha256(f'{prefix}{lang}\n{text.strip()}'.encode('utf-8')).hexdigest()
+
+
+# 이어 붙일 때 중간에 ID3 태그가 끼지 않도록 앞부분 태그를 떼어냄
+def strip_id3(data):
+    if data[:3] != b'ID3' or len(data) < 10:
+        return data
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    return data[10 + size:]
+
+
+# 대사 한 줄을 MP3 bytes 로 합성 (캐시에 있으면 그대로 사용)
+def synthesize_line(text, lang='en'):
+    cache = audio_cache()
+    key = line_key(text, lang)
+    cached = cache.get(key)
+    if cached is not None:
+        stage_metrics().record('tts_line', 0.0, cache='hit', bytes=len(cached))
+        return cached
+
+    # 여러 세션이 같은 대사를 동시에 합성하려 하면 한 번만 합성함
+    return get_singleflight('tts').do(key, render_line, cache, key, text, lang)
+
+
+def render_line(cache, key, text, lang):
+    backend = get_tts_backend()
+    with timed('tts_line', cache='miss', backend=backend.name) as event:
+        audio = strip_id3(backend.synthesize(text.strip(), lang))
+        event['bytes'] = len(audio)
+    cache.set(key, audio)
+    return audio
+
+
+# 여러 줄을 스레드 풀에서 동시에 합성하고, 결과는 입력 순서대로 돌려줌
+def synthesize_lines(lines, lang='en'):
+    futures = [_executor.submit(synthesize_line, line, lang) for line in lines if line.strip()]
+    return [future.result() for future in futures]
+
+
+# 줄별 MP3 프레임을 순서대로 이어 붙여 대본 전체 음성을 만듦
+def synthesize_script(lines, lang='en'):
+    return b''.join(synthesize_lines(lines, lang))
+
+
+# 미리 만들기로 스레드 풀에 넣어 둔 줄 (같은 줄을 화면이 다시 실행될 때마다 또 넣지 않도록)
+_prerendering = set()
+_prerendering_lock = threading.Lock()
+
+
+def prerender_done(key, future):
+    with _prerendering_lock:
+        _prerendering.discard(key)
+
+
+# 기다리지 않고 백그라운드에서 줄별 음성을 만들어 캐시에 넣음. 실패는 무시함 (누를 때 다시 시도됨)
+# 아직 캐시에 없는 줄 수를 돌려줌
+def prerender_lines(lines, lang='en'):
+    cache = audio_cache()
+    missing = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        key = line_key(line, lang)
+        if cache.get(key) is not None:
+            continue
+        missing += 1
+        with _prerendering_lock:
+            if key in _prerendering:
+                continue
+            _prerendering.add(key)
+        _executor.submit(synthesize_line, line, lang).add_done_callback(lambda future, key=key: prerender_done(key, future))
+    return missing
+
+
+# 모든 줄이 캐시에 있으면 이어 붙인 음성을, 하나라도 없으면 None
+def cached_script_audio(lines, lang='en'):
+    cache = audio_cache()
+    parts = [cache.get(line_key(line, lang)) for line in lines if line.strip()]
+    if not parts or None in parts:
+        return None
+    return b''.join(parts)
@@ -0,0 +1,44 @@
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger('enrole.usage')
+
+
+# 모델 호출마다 토큰 수와 걸린 시간을 모아 두는 프로세스 공용 집계
+# (캐시에서 바로 돌려준 요청은 호출이 아니므로 세지 않음)
+class UsageStats:
+    def __init__(self, recent=200):
+        self.lock = threading.Lock()
+        self.totals = {'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0, 'truncated': 0}
+        self.latencies = deque(maxlen=recent)
+
+    def record(self, model, usage, seconds, finish_reason=None, first_token_seconds=None):
+        usage = usage or {}
+        prompt_tokens = usage.get('prompt_tokens', 0)
+        completion_tokens = usage.get('completion_tokens', 0)
+        # 제공자 쪽 프롬프트 캐시에서 재사용된 앞부분 토큰 수
+        cached_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0)
+        with self.lock:
+            self.totals['calls'] += 1
+            self.totals['prompt_tokens'] += prompt_tokens
+            self.totals['cached_tokens'] += cached_tokens
+            self.totals['completion_tokens'] += completion_tokens
+            self.totals['truncated'] += finish_reason == 'length'
+            self.latencies.append(seconds)
+        logger.info('%s prompt=%d (cached %d) completion=%d %.2fs%s%s', model, prompt_tokens, cached_tokens,
+                    completion_tokens, seconds,
+                    '' if first_token_seconds is None else f' first token {first_token_seconds:.2f}s',
+                    ' (cut by max_tokens)' if finish_reason == 'length' else '')
+
+    def snapshot(self):
+        with self.lock:
+            latencies = list(self.latencies)
+            return dict(self.totals, latency_avg=sum(latencies) / len(latencies) if latencies else 0.0)
+
+
+_stats = UsageStats()
+
+
+def usage_stats():
+    return _stats
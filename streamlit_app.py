@@ -1,13 +1,27 @@
-import openai
+import hmac
 import os
+
 import streamlit as st
-from dotenv import load_dotenv
-from gtts import gTTS
-from googletrans import Translator
-from datetime import datetime
+from enrole.artifacts import SessionArtifacts
+from enrole.batch import BATCH_WORKERS, refresh_duplicates, run_batch
+from enrole.bilingual import generate_bilingual_with_gpt
+from enrole.bundle import bundle_bytes, iter_batch_bundle, iter_script_bundle
+from enrole.cache import llm_cache
+from enrole.duration import fit_script, spoken_seconds, target_range
+from enrole.library import get_library, remember_script
+from enrole.llm import configure_openai, generate_script_variants_with_gpt, generate_situation_with_gpt, translate_gpt
+from enrole.llm_client import get_llm_client
+from enrole.metrics import profiled, stage_metrics, start_metrics_server
+from enrole.parser import parse_script
+from enrole.pipeline import download_audio, download_script, generate_group_script, iter_script_with_translation, prerender_audio, ready_audio
+from enrole.router import get_router
+from enrole.singleflight import get_singleflight
+from enrole.situation_pool import get_situation_pool
+from enrole.translation_memory import get_translation_memory
+from enrole.usage import usage_stats
 
 # CSS 스타일 정의
-css = '''
+CSS = '''
 <style>
     /* stHorizontalBlock 요소 간의 간격 조절 */
     [data-testid="stHorizontalBlock"] {
@@ -42,271 +56,400 @@ css = '''
 </style>
 '''
 
-# 스타일 적용 및 코드 출력
-st.markdown(css, unsafe_allow_html=True)
-
-# .env 파일 로드
-load_dotenv()
-
-# OpenAI API 키 설정 (환경 변수에서 가져오기)
-api_key = os.getenv('OPENAI_API_KEY')
-
-if not api_key:
-    raise ValueError("OpenAI API key not found. Please set the OPENAI_API_KEY environment variable.")
-
-openai.api_key = api_key
-
-# ChatGPT API 호출 함수
-def generate_situation_with_gpt(num_people):
-    response = openai.ChatCompletion.create(
-        model="gpt-4.1-mini",
-    messages=[
-        {"role": "system",
-        "content": "You are a knowledgeable theater teacher with a knack for humor and creativity."},
-        {"role": "user", "content": f"In one short sentence(in 15 words), provide a unique background and situation in Korean for {num_people} people to role play. role can be adults not only students.(ex)우주선 고장으로 조난 당한 긴박한 상황."}
-    ]
-    )
-    # Convert the response to a Python dictionary
-    response_dict = response['choices'][0]['message']['content']
-    return response_dict
-
-# ChatGPT API 호출 함수
-def generate_script_with_gpt(grade, num_people, duration, key_phrases, key_words):
-    response = openai.ChatCompletion.create(
-        model="gpt-4.1",
-
-        messages=[
-        {"role": "system",
-        "content": "You are a skilled playwright specializing in role-playing scripts as a teacher. You excel at writing scripts with easy words, especially for elementary school students. You can write engaging role-play scripts using educationally appropriate words and situations that help students to use the key expressions in an interesting way."},
-        {"role": "user", "content": f'''Create a role-play script for {grade} grade Korean elementary school students. The script should play for {duration} seconds (a line in the script takes 4~5 seconds). Include {num_people} balanced roles in the script. Include Key phrases: {key_phrases} and Key words: {key_words}.
-         The format of the script is 'name:line'. Return scripts only.
-         {"" if situations=="" else "("+situations+") is The setting for the scenario you are creating. Reflect it in the background of the role-play scenario."}
-        #script example (make a script like this example's format. Same format, different content.)
-        [Characters]
-        1. Sumi: An active and curious student.
-        2. Jin: A calm and inquisitive student.
-        3. Minho: A student interested in history.
-        4. Hana: A responsible student who takes care of her friends.
-        
-        [Backgrounds]
-        When: Monday morning, right before the field trip.
-        Where: In the classroom and on the school bus.
-        Scene: Elementary school students are getting ready for a field trip to the museum.
-        They are discussing what they want to see and are excited about the trip.
-
-        [script]
-        Sumi: Hello, everyone! How are you today?    
-        Jin: I'm good, thank you. How about you, Sumi?        
-        Minho: I'm excited! We have a field trip today.        
-        Hana: Yes, we are going to the museum. What do you want to see first?        
-        Sumi: I want to see the dinosaur bones!        
-        Jin: Me too! Dinosaurs are so cool.
-        '''}
-    ]
-
-    )
-
-    # Convert the response to a Python dictionary
-    response_dict = response['choices'][0]['message']['content']
-    return response_dict
-
-def translate_gpt(script):
-    response = openai.ChatCompletion.create(
-        model="gpt-4.1",             # gpt-4.1으로 교체
-        temperature=0.0,             # 일관된 번역을 위해 0.0 고정
-    messages=[
-    {"role": "system",
-    "content": "You are a skilled playwright specializing in translating role-playing scripts for elementary school students. Your expertise is in using simple, educationally appropriate language that engages young learners. You excel at translating English scripts to Korean, maintaining the original context and simplicity."},
-    {"role": "user", "content": f'Please translate the following script to Korean, maintaining the same format and context. Ensure that the translation uses easy words suitable for elementary school students.\n{script}'}
-    ]
-    )
-
-    # Convert the response to a Python dictionary
-    response_dict = response['choices'][0]['message']['content']
-    return response_dict
-
-def translate_script(script, src='en', dest='ko'):
-    translator = Translator()
-    lines = script.split('\n')
-    translated_lines = []
-    
-    for line in lines:
-        if ':' in line:
-            name, sentence = line.split(':', 1)
-            translated_sentence = translator.translate(sentence.strip(), src=src, dest=dest).text
-            translated_lines.append(f'{name}: {translated_sentence}')
-        else:
-            translated_lines.append(line)
-    
-    return '\n'.join(translated_lines)
-
-
-def remove_extras(script):
-    # Extract lines after 'scripts:'
-    start_marker = "[script]"
-    
-    # Find the start position of the marker
-    start_pos = script.find(start_marker)
-    
-    # Check if the start_marker exists in the script
-    if start_pos == -1:
-        start_pos = script.find("[Script]")
-    if start_pos == -1:
-        start_pos = script.find("[Scripts]")
-    if start_pos == -1:
-        start_pos = script.find("[scripts]")
-    if start_pos == -1:
-        raise ValueError("The marker '[script]' not found in the script")
-
-    start_pos += len(start_marker)
-    
-    # Extract the lines after the marker
-    script_lines = script[start_pos:].strip().split("\n")
-    
-    # Remove the lines with Korean translations and character names
-    english_lines = []
-    for line in script_lines:
-        if ":" in line:
-            parts = line.split(":")
-            if len(parts) > 1:
-                english_line = parts[1].strip()
-                if english_line:  # Ensure the line is not empty
-                    english_lines.append(english_line)
-    
-    # Join the English lines into the final script
-    final_script = "\n".join(english_lines).strip()
-    
-    if not final_script:
-        raise ValueError("Final script after removing Korean translation is empty")
-    
-    return final_script
-
-def download_audio(script):
-    script_without_korean = remove_extras(script)
-    tts = gTTS(script_without_korean, lang='en')
-    audio_file_path = "script_audio.mp3"
-    tts.save(audio_file_path)
-    return audio_file_path
-
-def download_script(script):
-    script_file_path = "script.txt"
-    with open(script_file_path, "w", encoding="utf-8") as file:
-        file.write(script)
-    return script_file_path
-
-if 'situation' not in st.session_state:
-    st.session_state.situation = ''
-
-# Streamlit UI 구성
-st.title("영어 대본 생성기")
-st.subheader("EnRole: English Role-play Scripter")
-st.write("교사 박현수, 버그 및 개선 문의: hanzch84@gmail.com")
-cola, colb, colc = st.columns([2,3,4])
-
-grade = cola.selectbox("학년", ["3rd", "4th", "5th", "6th"], index=3)
-num_people = colb.slider("상황극 인원", min_value=2, max_value=10, value=3)
-duration = colc.slider("상황극 길이(초)", min_value=10, max_value=300, value=30,step=10)
-col_sit,col_rnd_btn = st.columns([10,1])
-if col_rnd_btn.button("랜덤"):
-    st.session_state.situation = generate_situation_with_gpt(num_people)
-situations = col_sit.text_input("간단한 상황 입력(한글 혹은 영어)",value=st.session_state.situation,key="situations",placeholder="대략적 상황을 한글이나 영어로 입력.(예)우주선 고장으로 조난 당함.",label_visibility="collapsed")
-
-
-with st.expander("상세 옵션"):
-    key_words = st.text_input("주요 단어 입력",key="words",placeholder="cold, headache, medicine 등 연습할 단어를 쉼표로 구분해서 입력하세요.")
-    key_phrases = st.text_area("주요 표현 입력",key="expressions",placeholder="What's wrong?, Get some rest 등 연습할 표현을 쉼표나 엔터로 구분해서 입력하세요.")
-    
-
-col1, col2, col22, col3, col33 = st.columns([3,2,3,2,3])
-
-# 스피너를 표시하면서 계산 진행 오버레이와 스피너를 위한 컨테이너 생성
-overlay_container = st.empty()
-# 오버레이와 스피너 추가
-overlay_container.markdown("""
+# 음성을 만드는 동안 화면을 덮는 오버레이
+OVERLAY = """
 <style>
-.overlay {
-    position: fixed;top: 0;left: 0;width: 100%;height: 100%;
-    background: rgba(0, 0, 0, 0.7);z-index: 999;display: flex;
-    justify-content: center;align-items: center;                }
-.spinner {margin-bottom: 10px;}
+    .overlay {
+        position: fixed;top: 0;left: 0;width: 100%;height: 100%;
+        background: rgba(0, 0, 0, 0.7);z-index: 999;display: flex;
+        justify-content: center;align-items: center;                }
+    .spinner {margin-bottom: 10px;}
 </style>
 <div class="overlay"><div><div class="spinner">
-            <span class="fa fa-spinner fa-spin fa-3x"></span>
-        </div><div style="color: white;">대본을 출력하는 중...</div></div></div>""", unsafe_allow_html=True)
-try:
-    content = st.session_state['script']
-    trans = st.session_state['translated']
-    script_placeholder = st.code(content,"http")
-    translate_placeholder = st.code(trans,"http")
-except:
-    content = "\n"*10+"Engish Script"
-    trans = "\n"*10+"한국어 번역"
-    script_placeholder = st.code(content,"http")
-    translate_placeholder = st.code(trans,"http")
-
-# 작업이 완료되면 오버레이와 스피너를 제거합니다.
-overlay_container.empty()
-
-if 'script' not in st.session_state:
-    st.session_state['script'] = ""
-    st.session_state['translated'] = ""
-
-if col1.button("상황극 대본 생성"):
+    <span class="fa fa-spinner fa-spin fa-3x"></span>
+</div><div style="color: white;">{message}</div></div></div>"""
+
+# 일괄 생성 표의 기본 행 (모둠 6개)
+DEFAULT_GROUPS = [{"num_people": 4, "situation": "", "key_words": ""} for _ in range(6)]
+
+
+# 프로세스마다 한 번만 만들고 모든 세션이 같이 씀 (API 키 확인, 랜덤 상황 풀)
+@st.cache_resource
+def openai_ready():
+    # .env 파일을 읽고 OpenAI API 키 설정 (환경 변수에서 가져오기)
+    return configure_openai()
+
+
+# ENROLE_METRICS_PORT 가 있으면 Prometheus 형식 /metrics 를 내보내는 서버를 띄움
+@st.cache_resource
+def metrics_server():
+    return start_metrics_server()
+
+
+@st.cache_resource
+def situation_pool():
+    return get_situation_pool(lambda people: generate_situation_with_gpt(people, refresh=True))
+
+
+# 설정 패널의 위젯 값은 key 로 세션에 남으므로 다른 패널은 여기서 읽어 씀
+def current_settings():
+    state = st.session_state
+    return {"grade": state["grade"], "num_people": state["num_people"], "duration": state["duration"],
+            "situation": state["situations"], "key_words": state["words"], "key_phrases": state["expressions"],
+            "refresh": state["refresh"], "bilingual": state["bilingual"], "variants": state["variants"]}
+
+
+def use_library_script(match):
+    st.session_state['script'], st.session_state['translated'] = match['script'], match['translated']
+    get_library().record_use(match['id'])
+
+
+# 주요 표현/단어/상황이 비슷한 예전 대본을 새로 만들기 전에 바로 보여줌 (같은 인원수만)
+# '새로 생성' 을 골랐으면 보여주지 않음
+def library_suggestions():
+    settings = current_settings()
+    if settings["refresh"]:
+        return
+    # 방금 만들어 화면에 있는 대본은 보관함에도 들어가 있으므로 빼고 찾음
+    matches = get_library().search(settings["num_people"], settings["key_phrases"], settings["key_words"],
+                                   settings["situation"], exclude_script=st.session_state['script'])
+    if not matches:
+        return
+    # 글자를 칠 때마다 이 패널이 다시 실행되므로, 같은 입력에 같은 제안이면 한 번만 셈
+    offer = (settings["num_people"], settings["key_phrases"], settings["key_words"], settings["situation"],
+             tuple(match['id'] for match in matches))
+    if st.session_state.get('library_offer') != offer:
+        st.session_state['library_offer'] = offer
+        get_library().record_offer()
+    with st.expander(f"비슷한 예전 대본 {len(matches)}개 (새로 만들지 않고 바로 사용)"):
+        for match in matches:
+            described = [f"유사도 {match['score']:.0%}", match['grade'], f"{match['num_people']}명", f"{match['duration']}초"]
+            described += [value for value in (match['key_phrases'], match['key_words'], match['situation']) if value]
+            st.caption(" · ".join(described))
+            st.code("\n".join(parse_script(match['script']).dialogue()[:4]), "http")
+            if st.button("이 대본 사용", key=f"library_{match['id']}"):
+                use_library_script(match)
+                # 대본/음성 패널도 이 대본으로 다시 그려야 하므로 전체를 다시 실행
+                st.rerun()
+
+
+def take_random_situation():
     try:
-        # 스피너를 표시하면서 계산 진행 오버레이와 스피너를 위한 컨테이너 생성
-        overlay_container = st.empty()
-        # 오버레이와 스피너 추가
-        overlay_container.markdown("""
-        <style>
-        .overlay {
-            position: fixed;top: 0;left: 0;width: 100%;height: 100%;
-            background: rgba(0, 0, 0, 0.7);z-index: 999;display: flex;
-            justify-content: center;align-items: center;                }
-        .spinner {margin-bottom: 10px;}
-        </style>
-        <div class="overlay"><div><div class="spinner">
-                    <span class="fa fa-spinner fa-spin fa-3x"></span>
-                </div><div style="color: white;">대본을 만들고 번역하는 중...</div></div></div>""", unsafe_allow_html=True)
-        st.session_state['script'] = generate_script_with_gpt(grade, num_people, duration, key_phrases, key_words)
-        st.session_state['translated'] = translate_gpt(st.session_state['script'])
+        st.session_state["situations"] = situation_pool().take(st.session_state["num_people"])
+    except ValueError as e:
+        st.session_state["situation_error"] = str(e)
+
+
+# 아래 패널들은 fragment 라서 안의 위젯을 바꾸면 그 패널만 다시 실행됨
+# (CSS, 제목, 다른 패널은 다시 그리지 않음)
+@st.fragment
+def settings_panel():
+    cola, colb, colc = st.columns([2,3,4])
+    cola.selectbox("학년", ["3rd", "4th", "5th", "6th"], index=3, key="grade")
+    num_people = colb.slider("상황극 인원", min_value=2, max_value=10, value=3, key="num_people")
+    duration = colc.slider("상황극 길이(초)", min_value=10, max_value=300, value=30, step=10, key="duration")
+    # 생성 패널의 목표 길이 안내는 다른 fragment 라서, 대본이 있을 때 길이를 바꾸면 전체를 다시 그림
+    if st.session_state['script'] and st.session_state.get('shown_duration', duration) != duration:
+        st.session_state['shown_duration'] = duration
+        st.rerun()
+    col_sit,col_rnd_btn = st.columns([10,1])
+    # 랜덤 상황은 백그라운드에서 인원수별로 미리 만들어 둔 풀에서 바로 꺼내 씀
+    situation_pool().warm(num_people)
+    col_rnd_btn.button("랜덤", on_click=take_random_situation)
+    col_sit.text_input("간단한 상황 입력(한글 혹은 영어)",key="situations",placeholder="대략적 상황을 한글이나 영어로 입력.(예)우주선 고장으로 조난 당함.",label_visibility="collapsed")
+    if "situation_error" in st.session_state:
+        st.error(st.session_state.pop("situation_error"))
+
+    with st.expander("상세 옵션"):
+        st.text_input("주요 단어 입력",key="words",placeholder="cold, headache, medicine 등 연습할 단어를 쉼표로 구분해서 입력하세요.")
+        st.text_area("주요 표현 입력",key="expressions",placeholder="What's wrong?, Get some rest 등 연습할 표현을 쉼표나 엔터로 구분해서 입력하세요.")
+        st.checkbox("저장된 결과 무시하고 새로 생성", key="refresh")
+        st.checkbox("대본과 번역을 한 번에 생성 (더 빠름, 글자가 차례로 나오지 않음)", key="bilingual")
+        st.slider("한 번에 만들 대본 수 (여러 개를 나란히 보고 하나를 고름, 고른 대본만 번역)", min_value=1, max_value=4,
+                  value=1, key="variants")
+        cache_stats = llm_cache().snapshot()
+        st.caption(f"캐시 적중 {cache_stats['memory_hits'] + cache_stats['disk_hits']}회 (메모리 {cache_stats['memory_hits']}, 디스크 {cache_stats['disk_hits']}), 미스 {cache_stats['misses']}회")
+        tm_stats = get_translation_memory().snapshot()
+        st.caption(f"번역 메모리 {tm_stats['entries']}문장, 재사용 {tm_stats['hits']}회")
+        pool_stats = situation_pool().snapshot()
+        st.caption(f"랜덤 상황 바로 제공 {pool_stats['hit_rate']:.0%}, 미리 만들기 평균 {pool_stats['refill_avg']:.1f}초")
+        usage = usage_stats().snapshot()
+        llm_flights, tts_flights = get_singleflight('llm').snapshot(), get_singleflight('tts').snapshot()
+        st.caption(f"동시에 들어온 같은 요청을 합쳐 아낀 호출: 모델 {llm_flights['shared']}회, 음성 {tts_flights['shared']}회")
+        st.caption(f"모델 호출 {usage['calls']}회, 입력 토큰 {usage['prompt_tokens']} (재사용 {usage['cached_tokens']}), 출력 토큰 {usage['completion_tokens']}, 평균 응답 {usage['latency_avg']:.1f}초")
+        routes = get_router().snapshot()
+        st.caption(f"사용 모델: 상황 {routes['situation']['model']}, 대본 {routes['script']['model']}, 번역 {routes['translate']['model']}")
+        client_stats = get_llm_client().snapshot()
+        st.caption(f"재시도 {client_stats['retries']}회, 대기열 초과 {client_stats['rejected'] + client_stats['throttled']}회, 실패 {client_stats['failures']}회")
+        library_stats = get_library().snapshot()
+        st.caption(f"대본 보관함 {library_stats['entries']}개, 비슷한 대본 제안 {library_stats['offered']}회, 사용 {library_stats['reused']}회")
+
+    library_suggestions()
+
+
+def run_generation(settings, script_placeholder, translate_placeholder):
+    st.session_state['script_variants'] = []
+    if settings["variants"] > 1:
+        # 한 번의 호출로 여러 대본을 받아 나란히 보여줌. 번역은 선생님이 고른 대본만 함
+        with st.spinner(f"대본 {settings['variants']}개를 만드는 중..."):
+            st.session_state['script_variants'] = generate_script_variants_with_gpt(
+                settings["grade"], settings["num_people"], settings["duration"], settings["key_phrases"],
+                settings["key_words"], settings["situation"], settings["variants"], settings["refresh"])
+        st.session_state['variant_settings'] = settings
+        return
+    if settings["bilingual"]:
+        # 한 번의 호출로 대본과 번역을 JSON 으로 받아 두 칸을 함께 채움
+        with st.spinner("대본과 번역을 만드는 중..."):
+            st.session_state['script'], st.session_state['translated'] = generate_bilingual_with_gpt(
+                settings["grade"], settings["num_people"], settings["duration"], settings["key_phrases"],
+                settings["key_words"], settings["situation"], settings["refresh"], get_translation_memory())
+        remember_script(settings["grade"], settings["num_people"], settings["duration"], settings["key_phrases"],
+                        settings["key_words"], settings["situation"], st.session_state['script'],
+                        st.session_state['translated'])
+        return
+    # 오버레이 대신 대본과 번역이 도착하는 대로 바로 보여줌
+    for kind, payload in iter_script_with_translation(settings["grade"], settings["num_people"], settings["duration"],
+                                                      settings["key_phrases"], settings["key_words"],
+                                                      settings["situation"], settings["refresh"]):
+        if kind == 'script':
+            script_placeholder.code(payload, "http")
+        elif kind == 'translation':
+            translate_placeholder.code(payload, "http")
+        else:
+            st.session_state['script'], st.session_state['translated'] = payload
+
+
+# 고른 대본만 번역해서 현재 대본으로 삼음 (번역 메모리와 캐시를 같이 씀)
+def pick_variant(index):
+    settings = st.session_state['variant_settings']
+    script = st.session_state['script_variants'][index]
+    with st.spinner("고른 대본을 번역하는 중..."):
+        translated = translate_gpt(script, settings["refresh"], get_translation_memory())
+    st.session_state['script'], st.session_state['translated'] = script, translated
+    st.session_state['picked_variant'] = index
+    remember_script(settings["grade"], settings["num_people"], settings["duration"], settings["key_phrases"],
+                    settings["key_words"], settings["situation"], script, translated)
+
+
+def variants_panel():
+    variants = st.session_state['script_variants']
+    columns = st.columns(len(variants))
+    for index, (column, variant) in enumerate(zip(columns, variants)):
+        with column:
+            chosen = st.session_state.get('picked_variant') == index and st.session_state['script'] == variant
+            st.caption(f"대본 {index + 1}" + (" (선택함)" if chosen else ""))
+            st.code(variant, "http")
+            if not chosen and st.button("이 대본 고르기", key=f"variant_{index}"):
+                try:
+                    pick_variant(index)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    st.rerun()
+
+
+@st.fragment
+def generation_panel():
+    if st.session_state.pop('celebrate', False):
         st.balloons()
-        overlay_container.empty()
+    clicked = st.button("상황극 대본 생성")
+
+    if st.session_state['script']:
         content = st.session_state['script']
-        trans = st.session_state['translated']    
-        script_placeholder.code(content,"http")
-        translate_placeholder.code(trans,"http")
-            
-        # 작업이 완료되면 오버레이와 스피너를 제거합니다.
-        
-    except ValueError as e:
-        st.error(str(e))
+        trans = st.session_state['translated']
+    else:
+        content = "\n"*10+"Engish Script"
+        trans = "\n"*10+"한국어 번역"
+    if st.session_state['script_variants']:
+        variants_panel()
+    script_placeholder = st.code(content,"http")
+    translate_placeholder = st.code(trans,"http")
 
-if st.session_state['script']:
-    if col2.button("음성 생성"):
-        # 스피너를 표시하면서 계산 진행 오버레이와 스피너를 위한 컨테이너 생성
+    if clicked:
+        # 관리 화면에서 요청했으면 이번 한 번만 cProfile 로 잡음
+        profile_next = st.session_state.pop('profile_next', False)
+        try:
+            with profiled(profile_next) as report:
+                run_generation(current_settings(), script_placeholder, translate_placeholder)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            if profile_next:
+                st.session_state['profile_report'] = report['text']
+            # 음성/대본 패널도 새 대본 기준으로 다시 그려야 하므로 한 번만 전체를 다시 실행
+            st.session_state['celebrate'] = not st.session_state['script_variants']
+            st.rerun()
+
+    if st.session_state['script']:
+        # 음성이 있으면 음성 길이로, 없으면 단어 수로 재생 길이를 어림해서 목표 길이와 함께 보여줌
+        document = parse_script(st.session_state['script'])
+        duration = st.session_state['shown_duration'] = st.session_state['duration']
+        seconds, source = spoken_seconds(document)
+        st.caption(f"대사 {len(document.lines)}줄, 예상 길이 약 {seconds:.0f}초 ({'음성' if source == 'audio' else '단어 수'} 기준, 목표 {duration}초)")
+
+        # 목표에서 벗어나면 전체를 다시 만들지 않고 이어 쓰거나(새 대사만 번역) 대사를 빼서 맞춤
+        low, high = target_range(duration)
+        if (seconds < low or seconds > high) and st.button("목표 길이에 맞추기 (" + ("대사 이어 쓰기" if seconds < low else "대사 줄이기") + ")"):
+            try:
+                with st.spinner("대본 길이를 맞추는 중..."):
+                    script, translated, action = fit_script(st.session_state['script'], st.session_state['translated'],
+                                                            duration, st.session_state['refresh'], get_translation_memory())
+                if action != 'ok':
+                    st.session_state['script'], st.session_state['translated'] = script, translated
+                    st.rerun()
+            except ValueError as e:
+                st.error(str(e))
+
+
+@st.fragment
+def audio_panel():
+    script = st.session_state['script']
+    artifacts = st.session_state['artifacts']
+    col_make, col_get = st.columns(2)
+    if col_make.button("음성 생성"):
         overlay_container = st.empty()
-        # 오버레이와 스피너 추가
-        overlay_container.markdown("""
-            <style>
-                .overlay {
-                    position: fixed;top: 0;left: 0;width: 100%;height: 100%;
-                    background: rgba(0, 0, 0, 0.7);z-index: 999;display: flex;
-                    justify-content: center;align-items: center;                }
-                .spinner {margin-bottom: 10px;} 
-            </style>
-            <div class="overlay"><div><div class="spinner">
-                <span class="fa fa-spinner fa-spin fa-3x"></span>
-            </div><div style="color: white;">"대본을 오디오 파일로 생성 중..."</div></div></div>""", unsafe_allow_html=True)
+        overlay_container.markdown(OVERLAY.replace("{message}", "대본을 오디오 파일로 생성 중..."), unsafe_allow_html=True)
         try:
-            audio_file = download_audio(st.session_state['script'])
-            with open(audio_file, "rb") as file:
-                col22.download_button(label="음성 다운로드", data=file, file_name="script_audio.mp3", mime="audio/mp3")
+            artifacts.get_or_create('audio', script, lambda: download_audio(script))
         except ValueError as e:
             st.error(str(e))
         overlay_container.empty()
 
+    audio = artifacts.get('audio', script)
+    if audio is None:
+        # 미리 만들어 둔 줄별 음성이 다 있으면 누르지 않아도 바로 내려받을 수 있음
+        audio = ready_audio(script)
+        if audio is not None:
+            artifacts.put('audio', script, audio)
+        elif prerender_audio(script):
+            col_get.caption("음성을 미리 만드는 중입니다. '음성 생성' 을 누르면 이어서 바로 만듭니다.")
+    if audio is not None:
+        col_get.download_button(label="음성 다운로드", data=audio, file_name="script_audio.mp3", mime="audio/mp3")
+
+
+@st.fragment
+def download_panel():
+    script_text = st.session_state['script']+'\n\n\n'+st.session_state['translated']
+    artifacts = st.session_state['artifacts']
+    col_make, col_get = st.columns(2)
+    if col_make.button("대본 생성"):
+        try:
+            artifacts.get_or_create('script', script_text, lambda: download_script(script_text))
+        except ValueError as e:
+            st.error(str(e))
 
-    if col3.button("대본 생성"):
-        script_file = download_script(st.session_state['script']+'\n\n\n'+st.session_state['translated'])
-        with open(script_file, "rb") as file:
-            col33.download_button(label="대본 다운로드", data=file, file_name="script.txt", mime="text/plain")
+    script_file = artifacts.get('script', script_text)
+    if script_file is not None:
+        col_get.download_button(label="대본 다운로드", data=script_file, file_name="script.txt", mime="text/plain")
+
+    # 누를 때에만(별도 스레드에서) 만드는 수업용 묶음: 영어/한국어 대본, 전체/인물별 음성, 대사 시간표
+    script, translated = st.session_state['script'], st.session_state['translated']
+    st.download_button(label="수업용 묶음 다운로드 (대본 + 인물별 음성, ZIP)", file_name="enrole_bundle.zip",
+                       mime="application/zip", on_click="ignore",
+                       data=lambda: bundle_bytes(iter_script_bundle(script, translated)))
+
+
+# 관리 화면 (?admin=<ENROLE_ADMIN_TOKEN>): 단계별 시간/크기/캐시 적중과 프로파일
+# 토큰을 정하지 않은 배포에서는 열리지 않음
+def is_admin():
+    token = os.getenv('ENROLE_ADMIN_TOKEN', '')
+    value = st.query_params.get('admin')
+    return bool(token) and value is not None and hmac.compare_digest(value.encode('utf-8'), token.encode('utf-8'))
+
+
+@st.fragment
+def admin_panel():
+    col_profile, col_refresh = st.columns(2)
+    if col_profile.button("다음 대본 생성 한 번 프로파일링"):
+        st.session_state['profile_next'] = True
+    col_refresh.button("지표 새로 고침")
+    if st.session_state.get('profile_next'):
+        st.caption("다음 '상황극 대본 생성' 을 cProfile 로 기록합니다. (번역/음성 스레드 안의 시간은 잡히지 않음)")
+
+    snapshot = stage_metrics().snapshot()
+    st.dataframe([{"단계": stage, "호출": stats['calls'], "오류": stats['errors'],
+                   "평균(초)": round(stats['seconds'] / stats['calls'], 3) if stats['calls'] else 0.0,
+                   "캐시 적중": stats['cache_hits'], "크기(bytes)": stats['bytes'], "토큰": stats['tokens']}
+                  for stage, stats in sorted(snapshot.items())], width="stretch")
+    st.code(stage_metrics().prometheus(), "text")
+    if st.session_state.get('profile_report'):
+        st.code(st.session_state['profile_report'], "text")
+
+
+# 학급 일괄 생성: 모둠마다 인원, 상황, 단어를 달리해서 한꺼번에 만들고 끝나는 대로 보여줌
+@st.fragment
+def batch_panel():
+    settings = current_settings()
+    groups = st.data_editor(DEFAULT_GROUPS, num_rows="dynamic", key="batch_groups", width="stretch",
+                            column_config={
+                                "num_people": st.column_config.NumberColumn("인원", min_value=2, max_value=10, step=1),
+                                "situation": st.column_config.TextColumn("상황"),
+                                "key_words": st.column_config.TextColumn("주요 단어"),
+                            })
+    max_workers = st.slider("동시에 만들 모둠 수", min_value=1, max_value=8, value=BATCH_WORKERS)
+
+    if st.button("모둠별 대본 한꺼번에 생성"):
+        specs = [{"grade": settings["grade"], "duration": settings["duration"], "key_phrases": settings["key_phrases"],
+                  "refresh": settings["refresh"], "bilingual": settings["bilingual"],
+                  "num_people": int(group.get("num_people") or settings["num_people"]),
+                  "situation": group.get("situation") or "", "key_words": group.get("key_words") or ""}
+                 for group in groups]
+        refresh_duplicates(specs)
+        slots = [st.empty() for _ in specs]
+        for number, slot in enumerate(slots, 1):
+            slot.info(f"{number}모둠 대본을 만드는 중...")
+        results = [(spec, None, None) for spec in specs]
+        for index, spec, result, error in run_batch(specs, generate_group_script, max_workers):
+            if error is not None:
+                slots[index].error(f"{index + 1}모둠: {error}")
+                continue
+            results[index] = (spec, *result)
+            slots[index].code(f"{index + 1}모둠\n\n{result[0]}\n\n\n{result[1]}", "http")
+        st.session_state['batch_results'] = results
+    elif st.session_state.get('batch_results'):
+        for number, (spec, script, translated) in enumerate(st.session_state['batch_results'], 1):
+            if script is not None:
+                st.code(f"{number}모둠\n\n{script}\n\n\n{translated}", "http")
+
+    if st.session_state.get('batch_results'):
+        results = list(st.session_state['batch_results'])
+        st.download_button(label="모둠별 수업용 묶음 다운로드 (인물별 음성 포함, ZIP)", file_name="enrole_groups.zip",
+                           mime="application/zip", on_click="ignore",
+                           data=lambda: bundle_bytes(iter_batch_bundle(results)))
+
+
+# 스타일 적용 (전체 실행 때만 보내고, 패널만 다시 실행될 때는 보내지 않음)
+st.markdown(CSS, unsafe_allow_html=True)
+openai_ready()
+metrics_server()
+
+if 'script' not in st.session_state:
+    st.session_state['script'] = ""
+    st.session_state['translated'] = ""
+if 'script_variants' not in st.session_state:
+    st.session_state['script_variants'] = []
+# 이 세션의 음성/대본 파일은 메모리에만 두고, 대본이 바뀔 때까지 다시 씀
+if 'artifacts' not in st.session_state:
+    st.session_state['artifacts'] = SessionArtifacts()
+
+# Streamlit UI 구성
+st.title("영어 대본 생성기")
+st.subheader("EnRole: English Role-play Scripter")
+st.write("교사 박현수, 버그 및 개선 문의: hanzch84@gmail.com")
+
+settings_panel()
+generation_panel()
+
+if st.session_state['script']:
+    col_audio, col_file = st.columns(2)
+    with col_audio:
+        audio_panel()
+    with col_file:
+        download_panel()
+
+with st.expander("학급 일괄 생성 (모둠별 대본)"):
+    batch_panel()
+
+if is_admin():
+    with st.expander("관리: 단계별 성능 지표", expanded=True):
+        admin_panel()